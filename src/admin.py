@@ -0,0 +1,117 @@
+"""Guarded admin endpoints for profiling a live worker.
+
+Disabled unless `[admin] enabled = true` in `project.toml`, which also
+requires `admin.token` (or the `ADMIN_TOKEN` env var). Requests must carry
+`x-admin-token` matching it; the client address is never trusted, since
+behind a local proxy every request comes from loopback. Each request reports
+on the worker process that served it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import hmac
+import os
+from pathlib import Path
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response
+import tomllib
+
+from services import profiling
+from services.stream_buffer import inflight_buffers
+
+
+@dataclass(frozen=True)
+class _AdminConfig:
+    enabled: bool = False
+    token: str = ""
+
+
+_CONFIG: _AdminConfig | None = None
+
+
+def load_admin_config(path: Path | None = None) -> _AdminConfig:
+    """Load and validate the `[admin]` table; called at startup to fail fast.
+
+    The result for the default `project.toml` is cached for the process.
+    """
+
+    global _CONFIG
+    if path is None and _CONFIG is not None:
+        return _CONFIG
+
+    project_toml_path = path or Path(__file__).resolve().parents[1] / "project.toml"
+    data: dict[str, Any] = {}
+    if project_toml_path.exists():
+        data = tomllib.loads(project_toml_path.read_text(encoding="utf-8"))
+
+    admin_cfg = data.get("admin") if isinstance(data, dict) else None
+    if not isinstance(admin_cfg, dict):
+        admin_cfg = {}
+
+    enabled = admin_cfg.get("enabled", False)
+    token = os.getenv("ADMIN_TOKEN") or admin_cfg.get("token", "")
+    if not isinstance(enabled, bool):
+        raise ValueError("Invalid config: admin.enabled must be boolean")
+    if not isinstance(token, str):
+        raise ValueError("Invalid config: admin.token must be a string")
+    if enabled and not token:
+        raise ValueError("Invalid config: admin.token (or ADMIN_TOKEN) is required when admin.enabled is true")
+
+    cfg = _AdminConfig(enabled=enabled, token=token)
+    if path is None:
+        _CONFIG = cfg
+    return cfg
+
+
+def _require_admin(request: Request) -> None:
+    cfg = load_admin_config()
+    if not cfg.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("x-admin-token", "")
+    if not cfg.token or not hmac.compare_digest(supplied.encode(), cfg.token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(_require_admin)])
+
+
+@router.post("/profile")
+async def profile_endpoint(
+    seconds: float = Query(10.0, gt=0, le=profiling.MAX_CAPTURE_SECONDS),
+    mode: str = Query("sample", pattern="^(sample|cprofile)$"),
+    interval_ms: float = Query(5.0, gt=0, le=1000),
+) -> Response:
+    try:
+        if mode == "cprofile":
+            stats = await profiling.capture_cprofile(seconds)
+            return Response(
+                stats,
+                media_type="application/octet-stream",
+                headers={"content-disposition": 'attachment; filename="adapter.pstats"'},
+            )
+        stacks = await profiling.capture_samples(seconds, interval=interval_ms / 1000.0)
+        return PlainTextResponse(
+            stacks, headers={"content-disposition": 'attachment; filename="adapter.collapsed"'}
+        )
+    except profiling.CaptureBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/tasks")
+async def tasks_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(profiling.dump_task_stacks())
+
+
+@router.post("/memory")
+async def memory_endpoint(
+    seconds: float = Query(5.0, ge=0, le=profiling.MAX_CAPTURE_SECONDS),
+    top: int = Query(25, gt=0, le=500),
+) -> dict:
+    try:
+        allocations = await profiling.capture_allocations(seconds, top=top)
+    except profiling.CaptureBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"pid": os.getpid(), "allocations": allocations, "streams": inflight_buffers(top=top)}
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
 from contextlib import asynccontextmanager
+import json
 import logging
+import math
 
-from fastapi import Body, FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
+import httpx
 
+from admin import load_admin_config, router as admin_router
 from logging_config import configure_logging
-from services.llm_proxy import proxy_response_stream
+from services import metrics
+from services.llm_proxy import close_upstream_pool, proxy_response_stream, start_upstream_pool
+from services.scheduler import ThrottledError
+from services.sessions import ResponseSession
+from services.stream_buffer import SlowClientAborted
 
 
 logger = logging.getLogger("codex_llm_adapter")
@@ -16,16 +24,20 @@ logger = logging.getLogger("codex_llm_adapter")
 @asynccontextmanager
 async def lifespan(_: FastAPI):
 	configure_logging()
+	load_admin_config()
+	await start_upstream_pool()
 	logger.info("startup")
 	yield
+	await close_upstream_pool()
 	logger.info("shutdown")
 
 
 app = FastAPI(title="codex_llm_adapter", lifespan=lifespan)
+app.include_router(admin_router)
 
 
 @app.post("/response")
-async def response_endpoint(payload: dict = Body(...)) -> StreamingResponse:
+async def response_endpoint(request: Request, payload: dict = Body(...)) -> StreamingResponse:
 	try:
 		stream = payload.get("stream")
 		if stream is not True:
@@ -33,7 +45,73 @@ async def response_endpoint(payload: dict = Body(...)) -> StreamingResponse:
 				status_code=400, detail="The stream parameter must be true; non-streaming is unsupported."
 			)
 
-		stream_iter = await proxy_response_stream(response_payload=payload)
+		stream_iter = await proxy_response_stream(response_payload=payload, headers=request.headers)
 		return StreamingResponse(stream_iter, media_type="text/event-stream")
 	except ValueError as e:
 		raise HTTPException(status_code=400, detail=str(e))
+	except ThrottledError as e:
+		raise HTTPException(
+			status_code=e.status_code, detail=str(e), headers={"retry-after": str(math.ceil(e.retry_after))}
+		)
+
+
+@app.websocket("/response")
+async def response_websocket(websocket: WebSocket) -> None:
+	"""One agent session per connection; one `/response` turn per message.
+
+	Each message (text, or UTF-8 bytes) is a `/response` payload (`stream`
+	is implied). The turn's SSE stream comes back as binary messages carrying
+	the same bytes as the HTTP endpoint, followed by a text message
+	`{"type": "response.done", "response_id": ...}`. A later turn may send
+	`previous_response_id` with only the new input items. A failed turn is
+	reported as `{"type": "error", "status": ..., "detail": ...}` and the
+	connection stays open for the next one.
+	"""
+
+	await websocket.accept()
+	session = ResponseSession()
+	try:
+		while True:
+			try:
+				message = await websocket.receive()
+				if message["type"] == "websocket.disconnect":
+					raise WebSocketDisconnect(message.get("code", 1000))
+				raw = message.get("text")
+				payload = json.loads(raw if raw is not None else message.get("bytes") or b"")
+				if not isinstance(payload, dict):
+					raise ValueError("Each message must be a JSON object")
+				payload = session.prepare_turn(payload)
+				stream_iter = await proxy_response_stream(
+					response_payload=payload, headers=websocket.headers, session=session
+				)
+				try:
+					async for chunk in stream_iter:
+						await websocket.send_bytes(chunk)
+				finally:
+					await stream_iter.aclose()
+			except ValueError as e:
+				await websocket.send_json({"type": "error", "status": 400, "detail": str(e)})
+				continue
+			except ThrottledError as e:
+				await websocket.send_json(
+					{"type": "error", "status": e.status_code, "detail": str(e), "retry_after": e.retry_after}
+				)
+				continue
+			except SlowClientAborted as e:
+				await websocket.send_json({"type": "error", "status": 503, "detail": str(e)})
+				continue
+			except httpx.HTTPError as e:
+				session.target = None
+				await websocket.send_json({"type": "error", "status": 502, "detail": str(e)})
+				continue
+			response_id = session.complete_turn(payload)
+			await websocket.send_json({"type": "response.done", "response_id": response_id})
+	except WebSocketDisconnect:
+		pass
+	finally:
+		session.close()
+
+
+@app.get("/metrics")
+async def metrics_endpoint() -> dict:
+	return metrics.snapshot()
@@ -0,0 +1,270 @@
+"""Production entry point: `python src/server.py`.
+
+Server tuning is read from the `[server]` table in `project.toml`. With more
+than one worker, each worker binds its own `SO_REUSEPORT` socket so the kernel
+spreads connections across them, and only starts listening once its lifespan
+startup (config load, upstream pool) has completed.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, replace
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import signal
+import socket
+import sys
+import time
+from typing import Any
+
+import tomllib
+
+
+logger = logging.getLogger("codex_llm_adapter.server")
+
+_LOOP_CHOICES = ("auto", "asyncio", "uvloop")
+_HTTP_CHOICES = ("auto", "h11", "httptools")
+
+# A worker that dies after startup is restarted after 0.5s, 1s, 2s, ... up to
+# 30s; more than `_MAX_RESTARTS` restarts within `_RESTART_WINDOW_SECONDS`
+# means something is persistently wrong and the supervisor gives up.
+_RESTART_BACKOFF_INITIAL = 0.5
+_RESTART_BACKOFF_MAX = 30.0
+_MAX_RESTARTS = 10
+_RESTART_WINDOW_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    host: str = "127.0.0.1"
+    port: int = 8000
+    workers: int = 1
+    loop: str = "auto"
+    http: str = "auto"
+    backlog: int = 2048
+    timeout_keep_alive: int = 5
+    reuse_port: bool = True
+    access_log: bool = False
+
+
+def load_server_config(path: Path | None = None) -> ServerConfig:
+    """Read the `[server]` table from `project.toml`; missing keys use defaults."""
+
+    if path is None:
+        path = Path(__file__).resolve().parents[1] / "project.toml"
+    data: dict[str, Any] = {}
+    if path.exists():
+        data = tomllib.loads(path.read_text(encoding="utf-8"))
+
+    raw = data.get("server") if isinstance(data, dict) else None
+    if not isinstance(raw, dict):
+        raw = {}
+
+    defaults = ServerConfig()
+    host = raw.get("host", defaults.host)
+    port = raw.get("port", defaults.port)
+    workers = raw.get("workers", defaults.workers)
+    loop = raw.get("loop", defaults.loop)
+    http = raw.get("http", defaults.http)
+    backlog = raw.get("backlog", defaults.backlog)
+    keep_alive = raw.get("timeout_keep_alive", defaults.timeout_keep_alive)
+    reuse_port = raw.get("reuse_port", defaults.reuse_port)
+    access_log = raw.get("access_log", defaults.access_log)
+
+    if not isinstance(host, str) or not host:
+        raise ValueError("Invalid config: server.host must be a non-empty string")
+    if not isinstance(port, int) or not 0 <= port <= 65535:
+        raise ValueError("Invalid config: server.port must be an integer in 0..65535")
+    if not isinstance(workers, int) or workers < 0:
+        raise ValueError("Invalid config: server.workers must be >= 0 (0 = one per CPU)")
+    if loop not in _LOOP_CHOICES:
+        raise ValueError(f"Invalid config: server.loop must be one of {list(_LOOP_CHOICES)}")
+    if http not in _HTTP_CHOICES:
+        raise ValueError(f"Invalid config: server.http must be one of {list(_HTTP_CHOICES)}")
+    if not isinstance(backlog, int) or backlog <= 0:
+        raise ValueError("Invalid config: server.backlog must be > 0")
+    if not isinstance(keep_alive, int) or keep_alive < 0:
+        raise ValueError("Invalid config: server.timeout_keep_alive must be >= 0")
+    if not isinstance(reuse_port, bool) or not isinstance(access_log, bool):
+        raise ValueError("Invalid config: server.reuse_port and server.access_log must be booleans")
+
+    return ServerConfig(
+        host=host,
+        port=port,
+        workers=workers or (os.cpu_count() or 1),
+        loop=loop,
+        http=http,
+        backlog=backlog,
+        timeout_keep_alive=keep_alive,
+        reuse_port=reuse_port,
+        access_log=access_log,
+    )
+
+
+def bind_socket(cfg: ServerConfig, *, reuse_port: bool) -> socket.socket:
+    """Bind, but do not listen on, the server socket.
+
+    uvicorn calls `listen()` only after lifespan startup, so the kernel does not
+    route connections to a worker that is still warming up.
+    """
+
+    family = socket.AF_INET6 if ":" in cfg.host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((cfg.host, cfg.port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve(cfg: ServerConfig, sock: socket.socket | None, ready: Any = None) -> None:
+    import uvicorn
+
+    from main import app
+
+    class _Server(uvicorn.Server):
+        async def startup(self, sockets: list[socket.socket] | None = None) -> None:
+            await super().startup(sockets=sockets)
+            if self.started and ready is not None:
+                ready.set()
+
+    if sock is None:
+        sock = bind_socket(cfg, reuse_port=False)
+    server = _Server(
+        uvicorn.Config(
+            app,
+            loop=cfg.loop,
+            http=cfg.http,
+            backlog=cfg.backlog,
+            timeout_keep_alive=cfg.timeout_keep_alive,
+            access_log=cfg.access_log,
+            lifespan="on",
+            log_config=None,
+        )
+    )
+    server.run(sockets=[sock])
+
+
+def _worker(cfg: ServerConfig, shared: socket.socket | None, ready: Any) -> None:
+    # Drop the supervisor's handlers inherited through fork; uvicorn installs its own.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    sock = shared if shared is not None else bind_socket(cfg, reuse_port=True)
+    _serve(cfg, sock, ready)
+
+
+@dataclass
+class _Slot:
+    proc: multiprocessing.process.BaseProcess | None
+    ready: Any
+    respawn_at: float = 0.0
+
+
+def _supervise(cfg: ServerConfig) -> int:
+    # Import the app once before forking so workers share the loaded modules
+    # copy-on-write instead of each paying the import cost.
+    import main  # noqa: F401
+
+    ctx = multiprocessing.get_context("fork")
+    use_reuse_port = cfg.reuse_port and hasattr(socket, "SO_REUSEPORT")
+    shared = None if use_reuse_port else bind_socket(cfg, reuse_port=False)
+
+    stopping = False
+    status = 0
+    slots: list[_Slot] = []
+    restarts: list[float] = []
+
+    def _spawn(slot: _Slot) -> None:
+        slot.ready = ctx.Event()
+        slot.proc = ctx.Process(target=_worker, args=(cfg, shared, slot.ready), daemon=False)
+        slot.proc.start()
+
+    def _stop(signum: int, _frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for slot in slots:
+            proc = slot.proc
+            if proc is not None and proc.is_alive() and proc.pid is not None:
+                os.kill(proc.pid, signum)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    for _ in range(cfg.workers):
+        slot = _Slot(proc=None, ready=None)
+        slots.append(slot)
+        _spawn(slot)
+    logger.info("started %d workers on %s:%d", cfg.workers, cfg.host, cfg.port)
+
+    while not stopping or any(slot.proc is not None for slot in slots):
+        if all(slot.proc is None for slot in slots):
+            time.sleep(0.1)
+        for slot in slots:
+            proc = slot.proc
+            if proc is None:
+                if not stopping and time.monotonic() >= slot.respawn_at:
+                    _spawn(slot)
+                continue
+            proc.join(timeout=0.5 / len(slots))
+            if proc.exitcode is None:
+                continue
+            slot.proc = None
+            if stopping:
+                continue
+
+            if not slot.ready.is_set():
+                # Dying before startup completes (port in use, bad config) will
+                # not fix itself by restarting.
+                logger.error("worker %s failed during startup (exit %s); stopping", proc.pid, proc.exitcode)
+                status = 1
+                _stop(signal.SIGTERM, None)
+                continue
+
+            now = time.monotonic()
+            restarts[:] = [t for t in restarts if now - t < _RESTART_WINDOW_SECONDS]
+            if len(restarts) >= _MAX_RESTARTS:
+                logger.error(
+                    "worker %s exited with %s; %d restarts in %.0fs, giving up",
+                    proc.pid,
+                    proc.exitcode,
+                    len(restarts),
+                    _RESTART_WINDOW_SECONDS,
+                )
+                status = 1
+                _stop(signal.SIGTERM, None)
+                continue
+            delay = min(_RESTART_BACKOFF_INITIAL * 2 ** len(restarts), _RESTART_BACKOFF_MAX)
+            restarts.append(now)
+            slot.respawn_at = now + delay
+            logger.warning("worker %s exited with %s; restarting in %.1fs", proc.pid, proc.exitcode, delay)
+    return status
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the codex-llm-adapter server.")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--workers", type=int, help="0 = one per CPU")
+    args = parser.parse_args(argv)
+
+    from logging_config import configure_logging
+
+    configure_logging()
+    cfg = load_server_config()
+    overrides = {k: v for k, v in vars(args).items() if v is not None}
+    if overrides.get("workers") == 0:
+        overrides["workers"] = os.cpu_count() or 1
+    cfg = replace(cfg, **overrides)
+
+    if cfg.workers == 1:
+        _serve(cfg, None)
+        return 0
+    return _supervise(cfg)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
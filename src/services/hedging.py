@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import logging
+import time
+from typing import Any, Awaitable, Callable, Sequence, TypeVar
+
+
+logger = logging.getLogger("codex_llm_adapter.hedging")
+
+T = TypeVar("T")
+
+# Percentile-based delays are only trusted once this many TTFTs are recorded.
+_MIN_SAMPLES = 20
+
+
+@dataclass(frozen=True)
+class HedgeConfig:
+    enabled: bool = False
+    models: tuple[str, ...] = ("*",)
+    percentile: float = 95.0
+    initial_delay_ms: float = 1000.0
+    min_delay_ms: float = 100.0
+    max_delay_ms: float = 10000.0
+    budget_percent: float = 5.0
+    window: int = 200
+
+    def applies_to(self, model: str) -> bool:
+        return self.enabled and ("*" in self.models or model in self.models)
+
+
+def load_hedge_config(raw: Any) -> HedgeConfig:
+    """Build a `HedgeConfig` from the `[llm_proxy.hedging]` table."""
+
+    if raw is None:
+        return HedgeConfig()
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid config: llm_proxy.hedging must be a table")
+
+    defaults = HedgeConfig()
+    enabled = raw.get("enabled", defaults.enabled)
+    models = raw.get("models", list(defaults.models))
+    if not isinstance(enabled, bool):
+        raise ValueError("Invalid config: llm_proxy.hedging.enabled must be boolean")
+    if not isinstance(models, list) or not all(isinstance(m, str) and m for m in models):
+        raise ValueError("Invalid config: llm_proxy.hedging.models must be a list of model names")
+
+    numbers: dict[str, float] = {}
+    for name in (
+        "percentile",
+        "initial_delay_ms",
+        "min_delay_ms",
+        "max_delay_ms",
+        "budget_percent",
+    ):
+        value = raw.get(name, getattr(defaults, name))
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"Invalid config: llm_proxy.hedging.{name} must be a number >= 0")
+        numbers[name] = float(value)
+    if not 0 < numbers["percentile"] <= 100:
+        raise ValueError("Invalid config: llm_proxy.hedging.percentile must be in (0, 100]")
+    if numbers["min_delay_ms"] > numbers["max_delay_ms"]:
+        raise ValueError("Invalid config: llm_proxy.hedging.min_delay_ms must be <= max_delay_ms")
+    window = raw.get("window", defaults.window)
+    if not isinstance(window, int) or window < _MIN_SAMPLES:
+        raise ValueError(f"Invalid config: llm_proxy.hedging.window must be >= {_MIN_SAMPLES}")
+
+    return HedgeConfig(enabled=enabled, models=tuple(models), window=window, **numbers)
+
+
+class HedgePolicy:
+    """Decide when to fire a hedge and keep the numbers behind that decision.
+
+    The delay is the configured percentile of recent time-to-first-byte for
+    the model. Hedges draw from a budget that earns `budget_percent / 100` of
+    a hedge per request, so extra upstream load stays below that share.
+    """
+
+    def __init__(self, config: HedgeConfig) -> None:
+        self.config = config
+        self._ttft: dict[str, deque[float]] = {}
+        self._budget = 0.0
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+        self.hedges_skipped_capacity = 0
+
+    def delay_for(self, model: str) -> float:
+        """Seconds to wait for a first byte before hedging."""
+
+        cfg = self.config
+        samples = self._ttft.get(model)
+        if samples is None or len(samples) < _MIN_SAMPLES:
+            delay_ms = cfg.initial_delay_ms
+        else:
+            ordered = sorted(samples)
+            index = min(int(len(ordered) * cfg.percentile / 100.0), len(ordered) - 1)
+            delay_ms = ordered[index] * 1000.0
+        return min(max(delay_ms, cfg.min_delay_ms), cfg.max_delay_ms) / 1000.0
+
+    def record_ttft(self, model: str, seconds: float) -> None:
+        samples = self._ttft.get(model)
+        if samples is None:
+            samples = self._ttft[model] = deque(maxlen=self.config.window)
+        samples.append(seconds)
+
+    def note_request(self) -> None:
+        self.requests += 1
+        # Cap the bucket so a long quiet period cannot fund a hedge storm.
+        self._budget = min(self._budget + self.config.budget_percent / 100.0, 10.0)
+
+    def try_spend(self) -> bool:
+        if self._budget >= 1.0:
+            self._budget -= 1.0
+            self.hedges_fired += 1
+            return True
+        self.hedges_skipped += 1
+        return False
+
+    def refund(self) -> None:
+        """Return a hedge drawn with `try_spend` that could not be sent."""
+
+        self._budget += 1.0
+        self.hedges_fired -= 1
+        self.hedges_skipped_capacity += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "hedges_skipped_budget": self.hedges_skipped,
+            "hedges_skipped_capacity": self.hedges_skipped_capacity,
+        }
+
+
+async def hedged_open(
+    open_target: Callable[[str], Awaitable[T]],
+    targets: Sequence[str],
+    *,
+    model: str,
+    policy: HedgePolicy | None,
+    close: Callable[[T], Awaitable[None]],
+    reserve: Callable[[], bool] | None = None,
+) -> T:
+    """Open `targets[0]`, hedging to `targets[1]` if it is slow to respond.
+
+    `open_target` must return only once the first byte has arrived. The first
+    target to succeed wins; the other attempt is cancelled (or, if it also
+    completed, closed with `close`). Without a policy, or with fewer than two
+    targets, this is a plain `open_target(targets[0])`. `reserve` is asked for
+    capacity right before a hedge is sent; if it returns `False` the hedge is
+    skipped.
+    """
+
+    started = time.monotonic()
+    hedgeable = policy is not None and len(targets) > 1 and policy.config.applies_to(model)
+    if not hedgeable:
+        result = await open_target(targets[0])
+        if policy is not None:
+            policy.record_ttft(model, time.monotonic() - started)
+        return result
+
+    assert policy is not None
+    policy.note_request()
+    primary = asyncio.ensure_future(open_target(targets[0]))
+    attempts: dict[asyncio.Future[T], int] = {primary: 0}
+    winner: asyncio.Future[T] | None = None
+    closed: set[asyncio.Future[T]] = set()
+    try:
+        done, _ = await asyncio.wait((primary,), timeout=policy.delay_for(model))
+        if not done and policy.try_spend():
+            if reserve is None or reserve():
+                logger.info("hedging model=%s to %s", model, targets[1])
+                attempts[asyncio.ensure_future(open_target(targets[1]))] = 1
+            else:
+                policy.refund()
+
+        pending = set(attempts)
+        error: BaseException | None = None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                exc = task.exception()
+                if exc is not None:
+                    error = error or exc
+                elif winner is None:
+                    winner = task
+                else:
+                    closed.add(task)
+                    await close(task.result())
+        if winner is None:
+            assert error is not None
+            raise error
+    finally:
+        losers = [t for t in attempts if t is not winner and t not in closed]
+        for task in losers:
+            task.cancel()
+        for task, result in zip(losers, await asyncio.gather(*losers, return_exceptions=True)):
+            # A loser may have completed before the cancel landed.
+            if not isinstance(result, BaseException) and task.done() and not task.cancelled():
+                await close(result)
+
+    if attempts[winner] == 1:
+        policy.hedges_won += 1
+    policy.record_ttft(model, time.monotonic() - started)
+    return winner.result()
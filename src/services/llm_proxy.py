@@ -1,12 +1,38 @@
 from __future__ import annotations
 
+from contextlib import AsyncExitStack
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, AsyncIterator
+import re
+from typing import Any, AsyncIterator, Mapping
 
 import httpx
 import tomllib
 
+from services import metrics
+from services.hedging import HedgeConfig, HedgePolicy, hedged_open, load_hedge_config
+from services.routing import (
+    ConsistentHashRing,
+    RoutingConfig,
+    derive_session_key,
+    load_routing_config,
+)
+from services.scheduler import FairShareConfig, FairShareScheduler, Ticket, load_fair_share_config
+from services.sessions import ResponseSession, session_stats
+from services.stream_buffer import (
+    StreamBufferConfig,
+    buffer_stats,
+    buffer_stream,
+    load_stream_buffer_config,
+)
+from services.upstream import UpstreamTarget, load_targets
+from utils.context_budget import (
+    ContextBudgetConfig,
+    TokenEstimator,
+    fit_chat_payload_to_budget,
+    load_context_budget_config,
+)
+from utils.payload_fragments import FragmentCache, encode_chat_payload, encode_json
 from utils.request_formatter import format_response_request
 
 
@@ -15,9 +41,39 @@ class _ProxyConfig:
     upstream_base_url: str
     chat_completions_path: str
     request_timeout_seconds: float
+    upstreams: tuple[UpstreamTarget, ...] = ()
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    stream: StreamBufferConfig = StreamBufferConfig()
+    context: ContextBudgetConfig = ContextBudgetConfig()
+    hedging: HedgeConfig = HedgeConfig()
+    routing: RoutingConfig = RoutingConfig()
+    fair_share: FairShareConfig = FairShareConfig()
+
+    @property
+    def targets(self) -> tuple[str, ...]:
+        return tuple(u.base_url for u in self.upstreams) or (self.upstream_base_url,)
+
+    def upstream(self, base_url: str) -> UpstreamTarget:
+        for u in self.upstreams:
+            if u.base_url == base_url:
+                return u
+        return UpstreamTarget(base_url=base_url)
 
 
 _CONFIG: _ProxyConfig | None = None
+_CLIENTS: dict[str, httpx.AsyncClient] = {}
+_HEDGE_POLICY: HedgePolicy | None = None
+_ROUTER: ConsistentHashRing | None = None
+_SCHEDULER: FairShareScheduler | None = None
+_ESTIMATOR = TokenEstimator()
+_FRAGMENTS = FragmentCache()
+_JSON_HEADERS = {"content-type": "application/json"}
+
+metrics.register("payload_fragments", _FRAGMENTS.stats)
+metrics.register("sessions", session_stats)
+metrics.register("stream_buffers", buffer_stats)
+metrics.register("token_estimator", lambda: {"messages": _ESTIMATOR.messages})
 
 
 def _load_config() -> _ProxyConfig:
@@ -38,6 +94,8 @@ def _load_config() -> _ProxyConfig:
     upstream_base_url = llm_proxy_cfg.get("upstream_base_url", "http://localhost:8001")
     chat_completions_path = llm_proxy_cfg.get("chat_completions_path", "/chat/completions")
     timeout = llm_proxy_cfg.get("request_timeout_seconds", 30)
+    max_connections = llm_proxy_cfg.get("max_connections", 100)
+    max_keepalive = llm_proxy_cfg.get("max_keepalive_connections", 20)
 
     if not isinstance(upstream_base_url, str) or not upstream_base_url:
         raise ValueError("Invalid config: llm_proxy.upstream_base_url must be a non-empty string")
@@ -47,57 +105,363 @@ def _load_config() -> _ProxyConfig:
         )
     if not isinstance(timeout, (int, float)) or timeout <= 0:
         raise ValueError("Invalid config: llm_proxy.request_timeout_seconds must be > 0")
+    if not isinstance(max_connections, int) or max_connections <= 0:
+        raise ValueError("Invalid config: llm_proxy.max_connections must be > 0")
+    if not isinstance(max_keepalive, int) or max_keepalive < 0:
+        raise ValueError("Invalid config: llm_proxy.max_keepalive_connections must be >= 0")
+
+    upstreams = load_targets(llm_proxy_cfg, default_base_url=upstream_base_url)
 
     _CONFIG = _ProxyConfig(
-        upstream_base_url=upstream_base_url,
+        upstream_base_url=upstreams[0].base_url,
+        upstreams=upstreams,
         chat_completions_path=chat_completions_path,
         request_timeout_seconds=float(timeout),
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        stream=load_stream_buffer_config(llm_proxy_cfg),
+        context=load_context_budget_config(llm_proxy_cfg.get("context")),
+        hedging=load_hedge_config(llm_proxy_cfg.get("hedging")),
+        routing=load_routing_config(llm_proxy_cfg.get("routing")),
+        fair_share=load_fair_share_config(llm_proxy_cfg.get("fair_share")),
     )
     return _CONFIG
 
 
-def _build_chat_completions_url(cfg: _ProxyConfig) -> str:
-    return cfg.upstream_base_url.rstrip("/") + "/" + cfg.chat_completions_path.lstrip("/")
+def _get_hedge_policy(cfg: _ProxyConfig) -> HedgePolicy | None:
+    global _HEDGE_POLICY
+    if not cfg.hedging.enabled:
+        return None
+    if _HEDGE_POLICY is None:
+        _HEDGE_POLICY = HedgePolicy(cfg.hedging)
+        metrics.register("hedging", _HEDGE_POLICY.stats)
+    return _HEDGE_POLICY
+
+
+def _get_client(cfg: _ProxyConfig, base_url: str | None = None) -> httpx.AsyncClient:
+    """Return the process-wide client for one upstream, creating its pool on first use.
+
+    Each target gets its own client because the transport (TCP, Unix socket,
+    HTTP/2) is a property of the client, not of the request.
+    """
+
+    base_url = base_url or cfg.upstream_base_url
+    client = _CLIENTS.get(base_url)
+    if client is None:
+        client = cfg.upstream(base_url).build_client(
+            timeout=cfg.request_timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=cfg.max_connections,
+                max_keepalive_connections=cfg.max_keepalive_connections,
+            ),
+        )
+        _CLIENTS[base_url] = client
+    return client
+
+
+async def start_upstream_pool() -> None:
+    """Load config and create the upstream clients before the worker accepts traffic."""
+
+    cfg = _load_config()
+    for base_url in cfg.targets:
+        _get_client(cfg, base_url)
+
+
+async def close_upstream_pool() -> None:
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def _get_router(cfg: _ProxyConfig) -> ConsistentHashRing | None:
+    global _ROUTER
+    if not cfg.routing.affinity or len(cfg.targets) < 2:
+        return None
+    if _ROUTER is None:
+        _ROUTER = ConsistentHashRing(
+            cfg.targets,
+            virtual_nodes=cfg.routing.virtual_nodes,
+            load_factor=cfg.routing.load_factor,
+        )
+        metrics.register("routing", _ROUTER.stats)
+    return _ROUTER
+
+
+def _get_scheduler(cfg: _ProxyConfig) -> FairShareScheduler | None:
+    global _SCHEDULER
+    if not cfg.fair_share.enabled:
+        return None
+    if _SCHEDULER is None:
+        _SCHEDULER = FairShareScheduler(cfg.fair_share)
+        metrics.register("fair_share", _SCHEDULER.stats)
+    return _SCHEDULER
+
+
+def _order_targets(
+    cfg: _ProxyConfig,
+    router: ConsistentHashRing | None,
+    response_payload: dict[str, Any],
+    headers: Mapping[str, str] | None,
+) -> list[str]:
+    """Upstream base URLs in preference order for this request."""
+
+    if router is None:
+        return list(cfg.targets)
+    session_key = derive_session_key(
+        response_payload, headers=headers, header_names=cfg.routing.session_headers
+    )
+    if session_key is None:
+        return list(cfg.targets)
+    return router.order(session_key)
+
+
+def _format_chat_payload(
+    cfg: _ProxyConfig, response_payload: dict[str, Any], session: ResponseSession | None = None
+) -> tuple[dict[str, Any], bytes | None]:
+    """Translate and budget the payload; also returns the encoded `tools`.
+
+    `tools` is encoded once here and reused both for budgeting and for the
+    request body.
+    """
+
+    if session is not None:
+        chat_payload = format_response_request(response_payload=response_payload, history=session.history)
+    else:
+        chat_payload = format_response_request(response_payload=response_payload)
+    tools = chat_payload.get("tools")
+    tools_json = encode_json(tools) if isinstance(tools, list) else None
+    fit_chat_payload_to_budget(chat_payload, config=cfg.context, estimator=_ESTIMATOR, tools_json=tools_json)
+    return chat_payload, tools_json
+
+
+def _build_chat_completions_url(cfg: _ProxyConfig, base_url: str | None = None) -> str:
+    return cfg.upstream(base_url or cfg.upstream_base_url).url_for(cfg.chat_completions_path)
 
 
-async def proxy_response(*, response_payload: dict[str, Any]) -> dict[str, Any]:
+async def proxy_response(
+    *, response_payload: dict[str, Any], headers: Mapping[str, str] | None = None
+) -> dict[str, Any]:
     """Proxy a public `/response` payload to an upstream `/chat/completions`.
     """
 
     cfg = _load_config()
-    url = _build_chat_completions_url(cfg)
+    scheduler = _get_scheduler(cfg)
+    ticket = scheduler.admit(headers) if scheduler is not None else None
+    router = _get_router(cfg)
+    target = _order_targets(cfg, router, response_payload, headers)[0]
+    url = _build_chat_completions_url(cfg, target)
 
-    chat_payload = format_response_request(response_payload=response_payload)
+    chat_payload, tools_json = _format_chat_payload(cfg, response_payload)
+    body = encode_chat_payload(chat_payload, fragments=_FRAGMENTS, tools_json=tools_json)
+
+    client = _get_client(cfg, target)
+    if scheduler is not None and ticket is not None:
+        await scheduler.acquire(ticket)
+    if router is not None:
+        router.acquire(target)
+    try:
+        resp = await client.post(url, content=body, headers=_JSON_HEADERS)
+    finally:
+        if router is not None:
+            router.release(target)
+        if scheduler is not None and ticket is not None:
+            scheduler.release(ticket)
+    resp.raise_for_status()
+    data = resp.json()
+    if not isinstance(data, dict):
+        raise ValueError("Upstream response must be a JSON object")
+    return data
 
-    async with httpx.AsyncClient(timeout=cfg.request_timeout_seconds) as client:
-        resp = await client.post(url, json=chat_payload)
-        resp.raise_for_status()
-        data = resp.json()
-        if not isinstance(data, dict):
-            raise ValueError("Upstream response must be a JSON object")
-        return data
 
+async def proxy_response_stream(
+    *,
+    response_payload: dict[str, Any],
+    headers: Mapping[str, str] | None = None,
+    session: ResponseSession | None = None,
+) -> AsyncIterator[bytes]:
+    """Stream a public `/response` payload to an upstream `/chat/completions`.
 
-async def proxy_response_stream(*, response_payload: dict[str, Any]) -> AsyncIterator[bytes]:
-    """Stream a public `/response` payload to an upstream `/chat/completions`."""
+    `headers` are the inbound request headers, used to find the session for
+    sticky routing when `llm_proxy.routing.affinity` is enabled, and the
+    client for fair-share scheduling when `llm_proxy.fair_share` is enabled
+    (raising `ThrottledError` if the client is over its request rate). A
+    WebSocket `session` reuses its translated history and stays on the
+    upstream it was first routed to.
+    """
 
     cfg = _load_config()
-    url = _build_chat_completions_url(cfg)
+    scheduler = _get_scheduler(cfg)
+    ticket = scheduler.admit(headers) if scheduler is not None else None
+    router = _get_router(cfg)
+    if session is not None and session.target in cfg.targets:
+        targets = [session.target] + [t for t in cfg.targets if t != session.target]
+    else:
+        targets = _order_targets(cfg, router, response_payload, headers)
+        if session is not None:
+            session.target = targets[0]
+    # Keyed by base URL: Unix-socket targets all share the same request URL.
+    upstreams = {
+        base_url: (_get_client(cfg, base_url), _build_chat_completions_url(cfg, base_url))
+        for base_url in targets
+    }
 
-    chat_payload = format_response_request(response_payload=response_payload)
+    chat_payload, tools_json = _format_chat_payload(cfg, response_payload, session)
     chat_payload["stream"] = True
+    body = encode_chat_payload(chat_payload, fragments=_FRAGMENTS, tools_json=tools_json)
 
-    return _stream_chat_completions(
-        url=url, timeout=cfg.request_timeout_seconds, chat_payload=chat_payload
+    return buffer_stream(
+        _stream_chat_completions(
+            upstreams=upstreams,
+            body=body,
+            model=chat_payload["model"],
+            hedge_policy=_get_hedge_policy(cfg),
+            router=router,
+            scheduler=scheduler,
+            ticket=ticket,
+        ),
+        config=cfg.stream,
     )
 
 
+@dataclass
+class _OpenStream:
+    """An upstream stream whose first chunk has already arrived."""
+
+    target: str
+    stack: AsyncExitStack
+    chunks: AsyncIterator[bytes]
+    first: bytes
+
+
+async def _open_stream(client: httpx.AsyncClient, url: str, body: bytes, *, target: str) -> _OpenStream:
+    stack = AsyncExitStack()
+    try:
+        resp = await stack.enter_async_context(
+            client.stream("POST", url, content=body, headers=_JSON_HEADERS)
+        )
+        resp.raise_for_status()
+        chunks = resp.aiter_bytes()
+        first = b""
+        async for chunk in chunks:
+            if chunk:
+                first = chunk
+                break
+    except BaseException:
+        await stack.aclose()
+        raise
+    return _OpenStream(target=target, stack=stack, chunks=chunks, first=first)
+
+
+async def _close_stream(opened: _OpenStream) -> None:
+    await opened.stack.aclose()
+
+
+_SSE_EVENT_END = re.compile(rb"\r?\n\r?\n")
+_METER_MAX_TAIL = 64 * 1024
+
+
+class _TokenMeter:
+    """Charge streamed tokens to a fair-share client, one per chat-completion event.
+
+    Events end with a blank line (LF or CRLF) and may be split across chunks,
+    so the unterminated tail is carried into the next chunk. A tail longer
+    than `_METER_MAX_TAIL` is dropped uncounted rather than held for the rest
+    of the stream. `[DONE]` is not a token.
+    """
+
+    def __init__(self, scheduler: FairShareScheduler, ticket: Ticket) -> None:
+        self._scheduler = scheduler
+        self._ticket = ticket
+        self._tail = b""
+
+    def count(self, chunk: bytes) -> int:
+        events = _SSE_EVENT_END.split(self._tail + chunk)
+        self._tail = events.pop()
+        if len(self._tail) > _METER_MAX_TAIL:
+            self._tail = b""
+        return sum(
+            1
+            for event in events
+            if (event.startswith(b"data:") or b"\ndata:" in event) and not event.endswith(b"[DONE]")
+        )
+
+    async def charge(self, chunk: bytes) -> None:
+        await self._scheduler.consume_tokens(self._ticket, self.count(chunk))
+
+
 async def _stream_chat_completions(
-    *, url: str, timeout: float, chat_payload: dict[str, Any]
+    *,
+    upstreams: dict[str, tuple[httpx.AsyncClient, str]],
+    body: bytes,
+    model: str,
+    hedge_policy: HedgePolicy | None,
+    router: ConsistentHashRing | None = None,
+    scheduler: FairShareScheduler | None = None,
+    ticket: Ticket | None = None,
 ) -> AsyncIterator[bytes]:
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        async with client.stream("POST", url, json=chat_payload) as resp:
-            resp.raise_for_status()
-            async for chunk in resp.aiter_bytes():
+    # The upstream slot is taken here rather than by the caller: this body
+    # only runs once the stream is consumed, and its `finally` then always
+    # gives the slot back.
+    if scheduler is not None and ticket is not None:
+        await scheduler.acquire(ticket)
+
+    # Count each attempt against its own target while it is in flight, and
+    # the winning one until the stream ends, so bounded loads see long
+    # generations and a won hedge is charged to the target that serves it.
+    async def _open(base_url: str) -> _OpenStream:
+        if router is not None:
+            router.acquire(base_url)
+        try:
+            return await _open_stream(*upstreams[base_url], body, target=base_url)
+        except BaseException:
+            if router is not None:
+                router.release(base_url)
+            raise
+
+    async def _close(opened: _OpenStream) -> None:
+        try:
+            await _close_stream(opened)
+        finally:
+            if router is not None:
+                router.release(opened.target)
+
+    # A hedge is a second upstream request and needs a second slot; it is
+    # only sent if one is free, and handed back once the race is decided.
+    extra_slots = 0
+
+    def _reserve() -> bool:
+        nonlocal extra_slots
+        if scheduler is None or ticket is None:
+            return True
+        if not scheduler.try_acquire(ticket):
+            return False
+        extra_slots += 1
+        return True
+
+    opened: _OpenStream | None = None
+    try:
+        try:
+            opened = await hedged_open(
+                _open, list(upstreams), model=model, policy=hedge_policy, close=_close, reserve=_reserve
+            )
+        finally:
+            if scheduler is not None and ticket is not None:
+                for _ in range(extra_slots):
+                    scheduler.release(ticket)
+        meter = _TokenMeter(scheduler, ticket) if scheduler is not None and ticket is not None else None
+        async with opened.stack:
+            if opened.first:
+                if meter is not None:
+                    await meter.charge(opened.first)
+                yield opened.first
+            async for chunk in opened.chunks:
                 if chunk:
+                    if meter is not None:
+                        await meter.charge(chunk)
                     yield chunk
+    finally:
+        if router is not None and opened is not None:
+            router.release(opened.target)
+        if scheduler is not None and ticket is not None:
+            scheduler.release(ticket)
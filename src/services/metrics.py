@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+
+_COLLECTORS: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register(name: str, collector: Callable[[], dict[str, Any]]) -> None:
+    """Expose `collector()` under `name` in the `/metrics` snapshot.
+
+    Components keep their own plain-int counters and register a function that
+    reads them, so nothing is paid on the hot path beyond the increments.
+    """
+
+    _COLLECTORS[name] = collector
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    return {name: collector() for name, collector in _COLLECTORS.items()}
@@ -0,0 +1,166 @@
+"""On-demand diagnostics for a live worker.
+
+Nothing here runs until an admin endpoint asks for it: profilers and
+tracemalloc are imported, started and stopped per capture.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from contextlib import contextmanager
+import sys
+import threading
+from types import FrameType
+from typing import Any, Iterator
+
+
+MAX_CAPTURE_SECONDS = 120.0
+
+_CAPTURING = False
+
+
+class CaptureBusyError(RuntimeError):
+    """Another capture is already running in this worker."""
+
+
+async def capture_cprofile(seconds: float) -> bytes:
+    """Profile the event loop thread with cProfile; returns a pstats dump.
+
+    The bytes are what `pstats.Stats.dump_stats` writes, so they load with
+    `pstats.Stats(path)` or snakeviz.
+    """
+
+    import cProfile
+    import marshal
+
+    with _exclusive():
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(_clamp(seconds))
+        finally:
+            profiler.disable()
+        profiler.create_stats()
+        return marshal.dumps(profiler.stats)  # type: ignore[attr-defined]
+
+
+async def capture_samples(seconds: float, *, interval: float = 0.005) -> str:
+    """Sample the event loop thread's stack; returns collapsed stacks.
+
+    Output is one `frame;frame;... count` line per distinct stack, the input
+    format of flamegraph.pl and speedscope. A background thread does the
+    sampling, so overhead is bounded by `interval` and nothing is traced.
+    """
+
+    with _exclusive():
+        target = threading.get_ident()
+        counts: Counter[str] = Counter()
+        stop = threading.Event()
+
+        def _sample() -> None:
+            while not stop.wait(interval):
+                frame = sys._current_frames().get(target)
+                if frame is not None:
+                    counts[_collapse(frame)] += 1
+
+        sampler = threading.Thread(target=_sample, name="adapter-sampler", daemon=True)
+        sampler.start()
+        try:
+            await asyncio.sleep(_clamp(seconds))
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+        return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+def dump_task_stacks() -> str:
+    """Render the await chain of every asyncio task in this worker."""
+
+    lines: list[str] = []
+    for task in sorted(asyncio.all_tasks(), key=lambda t: t.get_name()):
+        lines.append(f"Task {task.get_name()} ({'done' if task.done() else 'pending'}):")
+        for frame in _await_chain(task.get_coro()):
+            code = frame.f_code
+            lines.append(f"  {code.co_filename}:{frame.f_lineno} in {code.co_name}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+async def capture_allocations(seconds: float, *, top: int = 25) -> list[dict[str, Any]]:
+    """Top allocation sites by size, traced for `seconds`.
+
+    If tracemalloc is already tracing (e.g. `PYTHONTRACEMALLOC`), it is left
+    running and the snapshot covers everything it has seen.
+    """
+
+    import tracemalloc
+
+    with _exclusive():
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            await asyncio.sleep(_clamp(seconds))
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+    stats = snapshot.statistics("lineno")[:top]
+    return [
+        {
+            "location": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+            "size_bytes": s.size,
+            "count": s.count,
+        }
+        for s in stats
+    ]
+
+
+@contextmanager
+def _exclusive() -> Iterator[None]:
+    # Profilers and tracemalloc are process-global; overlapping captures would
+    # corrupt each other's results.
+    global _CAPTURING
+    if _CAPTURING:
+        raise CaptureBusyError("a capture is already running in this worker")
+    _CAPTURING = True
+    try:
+        yield
+    finally:
+        _CAPTURING = False
+
+
+def _clamp(seconds: float) -> float:
+    return min(max(seconds, 0.0), MAX_CAPTURE_SECONDS)
+
+
+def _collapse(frame: FrameType | None) -> str:
+    names: list[str] = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _await_chain(coro: Any) -> list[FrameType]:
+    # Task.get_stack() only shows the outermost coroutine; follow the await
+    # chain through coroutines, async generators and generator-based awaitables.
+    frames: list[FrameType] = []
+    seen = 0
+    while coro is not None and seen < 256:
+        seen += 1
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None) or getattr(
+            coro, "gi_frame", None
+        )
+        if frame is not None:
+            frames.append(frame)
+        coro = (
+            getattr(coro, "cr_await", None)
+            or getattr(coro, "ag_await", None)
+            or getattr(coro, "gi_yieldfrom", None)
+        )
+    return frames
+
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+import hashlib
+import math
+from typing import Any, Mapping, Sequence
+
+
+@dataclass(frozen=True)
+class RoutingConfig:
+    affinity: bool = False
+    session_headers: tuple[str, ...] = ("session_id", "x-session-id")
+    virtual_nodes: int = 160
+    load_factor: float = 1.25
+
+
+def load_routing_config(raw: Any) -> RoutingConfig:
+    """Build a `RoutingConfig` from the `[llm_proxy.routing]` table."""
+
+    if raw is None:
+        return RoutingConfig()
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid config: llm_proxy.routing must be a table")
+
+    defaults = RoutingConfig()
+    affinity = raw.get("affinity", defaults.affinity)
+    headers = raw.get("session_headers", list(defaults.session_headers))
+    vnodes = raw.get("virtual_nodes", defaults.virtual_nodes)
+    load_factor = raw.get("load_factor", defaults.load_factor)
+
+    if not isinstance(affinity, bool):
+        raise ValueError("Invalid config: llm_proxy.routing.affinity must be boolean")
+    if not isinstance(headers, list) or not all(isinstance(h, str) and h for h in headers):
+        raise ValueError("Invalid config: llm_proxy.routing.session_headers must be a list of strings")
+    if not isinstance(vnodes, int) or vnodes <= 0:
+        raise ValueError("Invalid config: llm_proxy.routing.virtual_nodes must be > 0")
+    if not isinstance(load_factor, (int, float)) or load_factor < 1:
+        raise ValueError("Invalid config: llm_proxy.routing.load_factor must be >= 1")
+
+    return RoutingConfig(
+        affinity=affinity,
+        session_headers=tuple(h.lower() for h in headers),
+        virtual_nodes=vnodes,
+        load_factor=float(load_factor),
+    )
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def derive_session_key(
+    response_payload: dict[str, Any],
+    *,
+    headers: Mapping[str, str] | None,
+    header_names: Sequence[str],
+) -> str | None:
+    """Identify the agent session a `/response` request belongs to.
+
+    An explicit session header wins. Otherwise the session is the pair
+    (instructions, first user message): both stay fixed for the lifetime of a
+    Codex conversation while later turns only append to `input`.
+    """
+
+    if headers is not None:
+        for name in header_names:
+            value = headers.get(name)
+            if value:
+                return "h:" + value
+
+    instructions = response_payload.get("instructions")
+    input_items = response_payload.get("input")
+    if not isinstance(instructions, str) or not isinstance(input_items, list):
+        return None
+
+    first_user = ""
+    for item in input_items:
+        if isinstance(item, dict) and item.get("type") == "message" and item.get("role") == "user":
+            content = item.get("content")
+            if isinstance(content, list):
+                first_user = "\n".join(
+                    part["text"]
+                    for part in content
+                    if isinstance(part, dict) and isinstance(part.get("text"), str)
+                )
+            break
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(instructions.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(first_user.encode("utf-8"))
+    return "p:" + digest.hexdigest()
+
+
+class ConsistentHashRing:
+    """Consistent hashing with bounded loads over upstream targets.
+
+    Each target owns `virtual_nodes` points on a 64-bit ring. A session maps to
+    the first target clockwise from its hash whose in-flight count is below
+    `ceil(load_factor * (total_in_flight + 1) / len(targets))`, so a hot session
+    spills to its ring neighbour instead of overloading one backend, and
+    adding or removing a target only remaps the sessions next to its points.
+    """
+
+    def __init__(self, targets: Sequence[str], *, virtual_nodes: int, load_factor: float) -> None:
+        if not targets:
+            raise ValueError("ConsistentHashRing needs at least one target")
+        self._targets = list(dict.fromkeys(targets))
+        self._load_factor = load_factor
+        points = sorted(
+            (_hash64(f"{target}#{i}".encode("utf-8")), target)
+            for target in self._targets
+            for i in range(virtual_nodes)
+        )
+        self._hashes = [h for h, _ in points]
+        self._owners = [t for _, t in points]
+        self.in_flight = {target: 0 for target in self._targets}
+        self.routed = {target: 0 for target in self._targets}
+        self.spilled = 0
+
+    def order(self, session_key: str) -> list[str]:
+        """Targets in preference order for `session_key`.
+
+        The first entry is the bounded-load choice; the rest follow in ring
+        order and serve as hedge/failover candidates.
+        """
+
+        start = bisect.bisect(self._hashes, _hash64(session_key.encode("utf-8")))
+        ring: list[str] = []
+        seen: set[str] = set()
+        for i in range(len(self._owners)):
+            owner = self._owners[(start + i) % len(self._owners)]
+            if owner not in seen:
+                seen.add(owner)
+                ring.append(owner)
+                if len(ring) == len(self._targets):
+                    break
+
+        capacity = math.ceil(
+            self._load_factor * (sum(self.in_flight.values()) + 1) / len(self._targets)
+        )
+        for index, target in enumerate(ring):
+            if self.in_flight[target] < capacity:
+                if index:
+                    self.spilled += 1
+                return [target] + ring[:index] + ring[index + 1 :]
+        return ring
+
+    def acquire(self, target: str) -> None:
+        self.in_flight[target] += 1
+        self.routed[target] += 1
+
+    def release(self, target: str) -> None:
+        self.in_flight[target] -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": dict(self.in_flight),
+            "routed": dict(self.routed),
+            "spilled": self.spilled,
+        }
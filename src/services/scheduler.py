@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import hashlib
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Mapping
+
+
+PRIORITIES = ("interactive", "bulk")
+# Header values that identify a client by secret; only a digest is kept.
+_SECRET_HEADERS = ("authorization", "x-api-key")
+_MAX_TRACKED_CLIENTS = 4096
+
+
+@dataclass(frozen=True)
+class ClientPolicy:
+    """Share and rate limits for one client (`0` rates mean unlimited)."""
+
+    weight: float = 1.0
+    priority: str = "interactive"
+    requests_per_second: float = 0.0
+    request_burst: int = 20
+    tokens_per_second: float = 0.0
+    token_burst: int = 4000
+
+
+@dataclass(frozen=True)
+class FairShareConfig:
+    enabled: bool = False
+    max_concurrent: int = 64
+    max_queued: int = 1024
+    client_headers: tuple[str, ...] = ("x-api-key", "authorization", "x-client-id")
+    priority_header: str = "x-priority"
+    default: ClientPolicy = ClientPolicy()
+    clients: Mapping[str, ClientPolicy] = field(default_factory=dict)
+
+    def policy_for(self, client_id: str) -> ClientPolicy:
+        return self.clients.get(client_id, self.default)
+
+
+def load_fair_share_config(raw: Any) -> FairShareConfig:
+    """Build a `FairShareConfig` from the `[llm_proxy.fair_share]` table."""
+
+    if raw is None:
+        return FairShareConfig()
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid config: llm_proxy.fair_share must be a table")
+
+    defaults = FairShareConfig()
+    enabled = raw.get("enabled", defaults.enabled)
+    max_concurrent = raw.get("max_concurrent", defaults.max_concurrent)
+    max_queued = raw.get("max_queued", defaults.max_queued)
+    headers = raw.get("client_headers", list(defaults.client_headers))
+    priority_header = raw.get("priority_header", defaults.priority_header)
+    clients = raw.get("clients", {})
+
+    if not isinstance(enabled, bool):
+        raise ValueError("Invalid config: llm_proxy.fair_share.enabled must be boolean")
+    if not isinstance(max_concurrent, int) or max_concurrent <= 0:
+        raise ValueError("Invalid config: llm_proxy.fair_share.max_concurrent must be > 0")
+    if not isinstance(max_queued, int) or max_queued < 0:
+        raise ValueError("Invalid config: llm_proxy.fair_share.max_queued must be >= 0")
+    if not isinstance(headers, list) or not all(isinstance(h, str) and h for h in headers):
+        raise ValueError("Invalid config: llm_proxy.fair_share.client_headers must be a list of strings")
+    if not isinstance(priority_header, str) or not priority_header:
+        raise ValueError("Invalid config: llm_proxy.fair_share.priority_header must be a non-empty string")
+    if not isinstance(clients, dict):
+        raise ValueError("Invalid config: llm_proxy.fair_share.clients must be a table")
+
+    default = _load_policy(raw, "llm_proxy.fair_share", ClientPolicy())
+    return FairShareConfig(
+        enabled=enabled,
+        max_concurrent=max_concurrent,
+        max_queued=max_queued,
+        client_headers=tuple(h.lower() for h in headers),
+        priority_header=priority_header.lower(),
+        default=default,
+        clients={
+            client_id: _load_policy(entry, f"llm_proxy.fair_share.clients.{client_id!r}", default)
+            for client_id, entry in clients.items()
+        },
+    )
+
+
+def _load_policy(raw: Any, where: str, base: ClientPolicy) -> ClientPolicy:
+    if not isinstance(raw, dict):
+        raise ValueError(f"Invalid config: {where} must be a table")
+    weight = raw.get("weight", base.weight)
+    priority = raw.get("priority", base.priority)
+    rps = raw.get("requests_per_second", base.requests_per_second)
+    request_burst = raw.get("request_burst", base.request_burst)
+    tps = raw.get("tokens_per_second", base.tokens_per_second)
+    token_burst = raw.get("token_burst", base.token_burst)
+
+    if not isinstance(weight, (int, float)) or weight <= 0:
+        raise ValueError(f"Invalid config: {where}.weight must be > 0")
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid config: {where}.priority must be one of {list(PRIORITIES)}")
+    for name, value in (("requests_per_second", rps), ("tokens_per_second", tps)):
+        if not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"Invalid config: {where}.{name} must be >= 0")
+    for name, value in (("request_burst", request_burst), ("token_burst", token_burst)):
+        if not isinstance(value, int) or value <= 0:
+            raise ValueError(f"Invalid config: {where}.{name} must be > 0")
+
+    return ClientPolicy(
+        weight=float(weight),
+        priority=priority,
+        requests_per_second=float(rps),
+        request_burst=request_burst,
+        tokens_per_second=float(tps),
+        token_burst=token_burst,
+    )
+
+
+class ThrottledError(RuntimeError):
+    """A request was refused by rate limiting or load shedding."""
+
+    def __init__(self, message: str, *, status_code: int, retry_after: float) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int, now: float) -> None:
+        self.rate = rate
+        self.burst = float(burst)
+        self.level = float(burst)
+        self.stamp = now
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.burst, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def try_take(self, n: float, now: float) -> float:
+        """Take `n` if available; otherwise take nothing and return the wait."""
+
+        self._refill(now)
+        if self.level >= n:
+            self.level -= n
+            return 0.0
+        return (n - self.level) / self.rate
+
+    def take(self, n: float, now: float) -> float:
+        """Take `n`, going into debt if needed; return how long to pay it off."""
+
+        self._refill(now)
+        self.level -= n
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+
+class _Client:
+    def __init__(self, client_id: str, policy: ClientPolicy, now: float) -> None:
+        self.id = client_id
+        self.policy = policy
+        self.request_bucket = (
+            _TokenBucket(policy.requests_per_second, policy.request_burst, now)
+            if policy.requests_per_second > 0
+            else None
+        )
+        self.token_bucket = (
+            _TokenBucket(policy.tokens_per_second, policy.token_burst, now)
+            if policy.tokens_per_second > 0
+            else None
+        )
+        self.finish_tag = 0.0
+        self.active = 0
+        self.waiting = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.shed = 0
+        self.queued = 0
+        self.queue_seconds = 0.0
+        self.tokens = 0
+        self.throttled_seconds = 0.0
+
+
+@dataclass(frozen=True)
+class Ticket:
+    """An admitted request, to be passed back to `acquire`/`release`."""
+
+    client: _Client
+    priority: str
+
+
+class FairShareScheduler:
+    """Weighted-fair assignment of upstream slots across clients.
+
+    At most `max_concurrent` requests hold a slot at once. Waiting requests
+    are served interactive-first; within a priority, by start-time fair
+    queueing: each request is tagged `max(virtual time, client's last
+    finish tag)` and advances its client's tag by `1 / weight`, so a client
+    with many queued requests cannot crowd out one that just arrived.
+    """
+
+    def __init__(self, config: FairShareConfig, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.config = config
+        self._clock = clock
+        self._clients: OrderedDict[str, _Client] = OrderedDict()
+        self._queues: dict[str, list[tuple[float, int, asyncio.Future[None], _Client]]] = {
+            p: [] for p in PRIORITIES
+        }
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._in_use = 0
+        self._waiting = 0
+
+    def identify(self, headers: Mapping[str, str] | None) -> tuple[str, str]:
+        """Return `(client_id, priority)` for a request's headers.
+
+        A credential header (`x-api-key`, `authorization`) always decides the
+        identity when present, so a caller cannot shed its key's policy or
+        rotate into fresh rate-limit buckets by adding a self-chosen header;
+        plain headers such as `x-client-id` only name unauthenticated callers.
+        """
+
+        client_id = "anonymous"
+        if headers is not None:
+            names = sorted(self.config.client_headers, key=lambda name: name not in _SECRET_HEADERS)
+            for name in names:
+                value = headers.get(name)
+                if not value:
+                    continue
+                if name in _SECRET_HEADERS:
+                    secret = value.removeprefix("Bearer ").strip()
+                    client_id = "key:" + hashlib.blake2b(secret.encode(), digest_size=6).hexdigest()
+                else:
+                    client_id = value[:128]
+                break
+
+        priority = self.config.policy_for(client_id).priority
+        if headers is not None and headers.get(self.config.priority_header, "").lower() == "bulk":
+            priority = "bulk"
+        return client_id, priority
+
+    def admit(self, headers: Mapping[str, str] | None) -> Ticket:
+        """Apply the client's request rate limit and the queue bound.
+
+        Raises `ThrottledError` (429 or 503) if the request must be refused.
+        """
+
+        client_id, priority = self.identify(headers)
+        client = self._client(client_id)
+        client.requests += 1
+        if client.request_bucket is not None:
+            wait = client.request_bucket.try_take(1, self._clock())
+            if wait > 0:
+                client.rate_limited += 1
+                raise ThrottledError(
+                    f"Rate limit exceeded for client {client_id!r}", status_code=429, retry_after=wait
+                )
+        if self._in_use >= self.config.max_concurrent and self._waiting >= self.config.max_queued:
+            client.shed += 1
+            raise ThrottledError(
+                "Upstream capacity exhausted; try again later", status_code=503, retry_after=1.0
+            )
+        return Ticket(client=client, priority=priority)
+
+    async def acquire(self, ticket: Ticket) -> None:
+        """Wait for an upstream slot; pair with `release`."""
+
+        client = ticket.client
+        start = max(self._vtime, client.finish_tag)
+        client.finish_tag = start + 1.0 / client.policy.weight
+        if self._in_use < self.config.max_concurrent and self._waiting == 0:
+            self._grant(client, start)
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues[ticket.priority], (start, next(self._seq), future, client))
+        client.waiting += 1
+        client.queued += 1
+        self._waiting += 1
+        queued_at = self._clock()
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Granted just as the caller gave up; hand the slot on.
+                self.release(ticket)
+            raise
+        finally:
+            client.waiting -= 1
+            self._waiting -= 1
+            client.queue_seconds += self._clock() - queued_at
+
+    def try_acquire(self, ticket: Ticket) -> bool:
+        """Take an extra slot only if one is free and nobody is waiting for it."""
+
+        if self._in_use >= self.config.max_concurrent or self._waiting:
+            return False
+        self._in_use += 1
+        ticket.client.active += 1
+        return True
+
+    def release(self, ticket: Ticket) -> None:
+        ticket.client.active -= 1
+        self._in_use -= 1
+        self._dispatch()
+
+    async def consume_tokens(self, ticket: Ticket, tokens: int) -> None:
+        """Charge streamed tokens; sleeps while the client is over its token rate."""
+
+        client = ticket.client
+        client.tokens += tokens
+        if client.token_bucket is None or tokens <= 0:
+            return
+        delay = client.token_bucket.take(tokens, self._clock())
+        if delay > 0:
+            client.throttled_seconds += delay
+            await asyncio.sleep(delay)
+
+    def _grant(self, client: _Client, start: float) -> None:
+        self._vtime = max(self._vtime, start)
+        self._in_use += 1
+        client.active += 1
+
+    def _dispatch(self) -> None:
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._in_use < self.config.max_concurrent:
+                start, _, future, client = heapq.heappop(queue)
+                if future.done():
+                    continue
+                self._grant(client, start)
+                future.set_result(None)
+
+    def _client(self, client_id: str) -> _Client:
+        client = self._clients.get(client_id)
+        if client is not None:
+            self._clients.move_to_end(client_id)
+            return client
+        client = _Client(client_id, self.config.policy_for(client_id), self._clock())
+        self._clients[client_id] = client
+        if len(self._clients) > _MAX_TRACKED_CLIENTS:
+            excess = len(self._clients) - _MAX_TRACKED_CLIENTS
+            for stale_id in list(itertools.islice(self._clients, excess)):
+                stale = self._clients[stale_id]
+                if stale.active == 0 and stale.waiting == 0:
+                    del self._clients[stale_id]
+        return client
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "slots": self.config.max_concurrent,
+            "in_use": self._in_use,
+            "waiting": self._waiting,
+            "clients": {
+                c.id: {
+                    "priority": c.policy.priority,
+                    "weight": c.policy.weight,
+                    "active": c.active,
+                    "waiting": c.waiting,
+                    "requests": c.requests,
+                    "rate_limited": c.rate_limited,
+                    "shed": c.shed,
+                    "queued": c.queued,
+                    "queue_seconds": round(c.queue_seconds, 3),
+                    "tokens": c.tokens,
+                    "throttled_seconds": round(c.throttled_seconds, 3),
+                }
+                for c in self._clients.values()
+            },
+        }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import Any
+import uuid
+
+from utils.request_formatter import InputHistory
+
+
+class _SessionStats:
+    def __init__(self) -> None:
+        self.active = 0
+        self.opened = 0
+        self.turns = 0
+        self.delta_turns = 0
+        self.items_reused = 0
+        self.items_translated = 0
+
+
+_STATS = _SessionStats()
+
+
+def session_stats() -> dict[str, int]:
+    return {
+        "active": _STATS.active,
+        "opened": _STATS.opened,
+        "turns": _STATS.turns,
+        "delta_turns": _STATS.delta_turns,
+        "items_reused": _STATS.items_reused,
+        "items_translated": _STATS.items_translated,
+    }
+
+
+class ResponseSession:
+    """State for one agent session kept hot across turns on a WebSocket.
+
+    - `history` caches the chat translation of the conversation's input items.
+    - `target` pins the upstream chosen on the first turn, so later turns skip
+      routing and keep hitting the backend that holds the session's prefix
+      cache. It is cleared when a turn against it fails.
+    - `input_items` is the full input of the last turn, so a turn may send
+      only new items along with `previous_response_id`.
+    """
+
+    def __init__(self) -> None:
+        self.id = uuid.uuid4().hex
+        self.history = InputHistory()
+        self.target: str | None = None
+        self.input_items: list[Any] = []
+        self.last_response_id: str | None = None
+        self.turns = 0
+        self._reported = (0, 0)
+        _STATS.active += 1
+        _STATS.opened += 1
+
+    def prepare_turn(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """Resolve a delta turn into a full `/response` payload.
+
+        With `previous_response_id`, `input` holds only the items added since
+        that response (including the assistant's own output items) and is
+        appended to the stored history.
+        """
+
+        previous = payload.get("previous_response_id")
+        input_items = payload.get("input")
+        if previous is None:
+            return payload
+        if previous != self.last_response_id:
+            raise ValueError(f"Unknown previous_response_id: {previous!r}")
+        if not isinstance(input_items, list):
+            raise ValueError("Missing or invalid required field: 'input'")
+        _STATS.delta_turns += 1
+        return {**payload, "input": self.input_items + input_items}
+
+    def complete_turn(self, payload: dict[str, Any]) -> str:
+        """Record a finished turn and return the id that continues from it."""
+
+        self.input_items = payload["input"]
+        self.turns += 1
+        self.last_response_id = f"resp_{self.id}_{self.turns}"
+        _STATS.turns += 1
+        reused, translated = self._reported
+        _STATS.items_reused += self.history.reused - reused
+        _STATS.items_translated += self.history.translated - translated
+        self._reported = (self.history.reused, self.history.translated)
+        return self.last_response_id
+
+    def close(self) -> None:
+        _STATS.active -= 1
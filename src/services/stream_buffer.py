@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass
+import logging
+from typing import Any, AsyncIterator
+import weakref
+
+
+logger = logging.getLogger("codex_llm_adapter.stream")
+
+SLOW_CLIENT_POLICIES = ("abort", "shed", "wait")
+
+
+class SlowClientAborted(RuntimeError):
+    """A stream was cut short by the `abort` or `shed` slow-client policy."""
+
+
+@dataclass(frozen=True)
+class StreamBufferConfig:
+    """Per-stream buffering between the upstream reader and the client writer.
+
+    Coalescing: chunks arriving within `coalesce_window_seconds` of each other
+    are merged into writes of up to `coalesce_max_bytes` (a window of `0`
+    writes whatever is buffered as soon as the client can take it).
+
+    Backpressure: once a stream holds `high_watermark_bytes`, upstream reads
+    pause until the client drains it to `low_watermark_bytes`. Streams also
+    pause above the low watermark while all streams together hold more than
+    `max_total_bytes`. A stream paused for `slow_client_timeout_seconds` is
+    handled by `slow_client_policy`:
+    - `abort`: drop the buffer and fail the stream at once.
+    - `shed`: close the upstream (freeing the backend slot), let the client
+      drain what is already buffered, then fail the stream.
+    - `wait`: keep waiting.
+
+    A failed stream raises `SlowClientAborted`, so a truncated response is
+    never mistaken for a complete one.
+    """
+
+    coalesce_window_seconds: float = 0.01
+    coalesce_max_bytes: int = 16384
+    high_watermark_bytes: int = 1024 * 1024
+    low_watermark_bytes: int = 256 * 1024
+    slow_client_timeout_seconds: float = 30.0
+    slow_client_policy: str = "abort"
+    max_total_bytes: int = 256 * 1024 * 1024
+
+
+def load_stream_buffer_config(llm_proxy_cfg: dict[str, Any]) -> StreamBufferConfig:
+    """Read the `stream_coalesce_*` keys and the `[llm_proxy.backpressure]` table."""
+
+    defaults = StreamBufferConfig()
+    window_ms = llm_proxy_cfg.get("stream_coalesce_window_ms", defaults.coalesce_window_seconds * 1000)
+    max_bytes = llm_proxy_cfg.get("stream_coalesce_max_bytes", defaults.coalesce_max_bytes)
+    if not isinstance(window_ms, (int, float)) or window_ms < 0:
+        raise ValueError("Invalid config: llm_proxy.stream_coalesce_window_ms must be >= 0")
+    if not isinstance(max_bytes, int) or max_bytes <= 0:
+        raise ValueError("Invalid config: llm_proxy.stream_coalesce_max_bytes must be > 0")
+
+    raw = llm_proxy_cfg.get("backpressure", {})
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid config: llm_proxy.backpressure must be a table")
+    high = raw.get("high_watermark_bytes", defaults.high_watermark_bytes)
+    low = raw.get("low_watermark_bytes", defaults.low_watermark_bytes)
+    timeout = raw.get("slow_client_timeout_seconds", defaults.slow_client_timeout_seconds)
+    policy = raw.get("slow_client_policy", defaults.slow_client_policy)
+    total = raw.get("max_total_bytes", defaults.max_total_bytes)
+
+    if not isinstance(high, int) or high < max_bytes:
+        raise ValueError(
+            "Invalid config: llm_proxy.backpressure.high_watermark_bytes must be >= stream_coalesce_max_bytes"
+        )
+    if not isinstance(low, int) or not 0 <= low < high:
+        raise ValueError(
+            "Invalid config: llm_proxy.backpressure.low_watermark_bytes must be in [0, high_watermark_bytes)"
+        )
+    if not isinstance(timeout, (int, float)) or timeout <= 0:
+        raise ValueError("Invalid config: llm_proxy.backpressure.slow_client_timeout_seconds must be > 0")
+    if policy not in SLOW_CLIENT_POLICIES:
+        raise ValueError(
+            f"Invalid config: llm_proxy.backpressure.slow_client_policy must be one of {list(SLOW_CLIENT_POLICIES)}"
+        )
+    if not isinstance(total, int) or total < high:
+        raise ValueError(
+            "Invalid config: llm_proxy.backpressure.max_total_bytes must be >= high_watermark_bytes"
+        )
+
+    return StreamBufferConfig(
+        coalesce_window_seconds=float(window_ms) / 1000.0,
+        coalesce_max_bytes=max_bytes,
+        high_watermark_bytes=high,
+        low_watermark_bytes=low,
+        slow_client_timeout_seconds=float(timeout),
+        slow_client_policy=policy,
+        max_total_bytes=total,
+    )
+
+
+class _BufferStats:
+    def __init__(self) -> None:
+        self.buffered_bytes = 0
+        self.paused = 0
+        self.slow_clients = 0
+        self.aborted = 0
+        self.shed = 0
+
+
+_STATS = _BufferStats()
+_ACTIVE: weakref.WeakSet[_StreamBuffer] = weakref.WeakSet()
+
+
+def buffer_stats() -> dict[str, int]:
+    return {
+        "active_streams": len(_ACTIVE),
+        "buffered_bytes": _STATS.buffered_bytes,
+        "paused": _STATS.paused,
+        "slow_clients": _STATS.slow_clients,
+        "aborted": _STATS.aborted,
+        "shed": _STATS.shed,
+    }
+
+
+def inflight_buffers(*, top: int = 20) -> list[dict[str, Any]]:
+    """The largest per-stream buffers currently held, biggest first."""
+
+    buffers = sorted(_ACTIVE, key=lambda b: b.buffered_bytes, reverse=True)[:top]
+    return [
+        {
+            "stream": hex(id(b)),
+            "buffered_bytes": b.buffered_bytes,
+            "chunks_in": b.chunks_in,
+            "writes_out": b.writes_out,
+            "paused": b.paused,
+        }
+        for b in buffers
+    ]
+
+
+def buffer_stream(source: AsyncIterator[bytes], *, config: StreamBufferConfig) -> AsyncIterator[bytes]:
+    """Decouple `source` from its consumer through a bounded, coalescing buffer."""
+
+    return _StreamBuffer(source, config).drain()
+
+
+class _StreamBuffer:
+    """Read `source` in a background task and hand out batched writes.
+
+    The upstream reader never waits on the client until the high watermark is
+    reached, and the writer only wakes once per batch, so per-chunk cost is a
+    list append.
+    """
+
+    def __init__(self, source: AsyncIterator[bytes], config: StreamBufferConfig) -> None:
+        self._source = source
+        self._cfg = config
+        self._parts: list[bytes] = []
+        self._size = 0
+        self._first_arrival = 0.0
+        self._last_arrival = float("-inf")
+        self._finished = False
+        self._aborted: SlowClientAborted | None = None
+        self._error: BaseException | None = None
+        self._readable = asyncio.Event()
+        self._flush = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.paused = False
+        self.chunks_in = 0
+        self.writes_out = 0
+
+    @property
+    def buffered_bytes(self) -> int:
+        return self._size
+
+    async def drain(self) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        window = self._cfg.coalesce_window_seconds
+        reader = asyncio.create_task(self._read(loop))
+        _ACTIVE.add(self)
+        try:
+            while True:
+                if self._aborted is not None:
+                    raise self._aborted
+                if not self._parts:
+                    if self._finished:
+                        break
+                    self._readable.clear()
+                    await self._readable.wait()
+                    continue
+
+                if window > 0 and not self._flush.is_set():
+                    remaining = self._first_arrival + window - loop.time()
+                    if remaining > 0:
+                        timer = loop.call_later(remaining, self._flush.set)
+                        await self._flush.wait()
+                        timer.cancel()
+                        if self._aborted is not None:
+                            raise self._aborted
+
+                data = self._take()
+                self.writes_out += 1
+                yield data
+
+            if self._error is not None:
+                raise self._error
+        finally:
+            _ACTIVE.discard(self)
+            self._release(self._size)
+            self._parts.clear()
+            reader.cancel()
+            with suppress(BaseException):
+                await reader
+            logger.debug(
+                "stream buffered %d upstream chunks into %d writes", self.chunks_in, self.writes_out
+            )
+
+    def _take(self) -> bytes:
+        limit = self._cfg.coalesce_max_bytes
+        taken = 0
+        count = 0
+        for part in self._parts:
+            if count and taken + len(part) > limit:
+                break
+            taken += len(part)
+            count += 1
+        if count == len(self._parts):
+            data = b"".join(self._parts)
+            self._parts.clear()
+            self._flush.clear()
+        else:
+            data = b"".join(self._parts[:count])
+            del self._parts[:count]
+        self._release(taken)
+        if self.paused and self._size <= self._cfg.low_watermark_bytes:
+            self._writable.set()
+        return data
+
+    def _release(self, nbytes: int) -> None:
+        self._size -= nbytes
+        _STATS.buffered_bytes -= nbytes
+
+    def _must_pause(self) -> bool:
+        cfg = self._cfg
+        if self._size >= cfg.high_watermark_bytes:
+            return True
+        return _STATS.buffered_bytes >= cfg.max_total_bytes and self._size > cfg.low_watermark_bytes
+
+    async def _read(self, loop: asyncio.AbstractEventLoop) -> None:
+        window = self._cfg.coalesce_window_seconds
+        try:
+            async for chunk in self._source:
+                if not chunk:
+                    continue
+                self.chunks_in += 1
+                now = loop.time()
+                if not self._parts:
+                    self._first_arrival = now
+                    if now - self._last_arrival >= window:
+                        self._flush.set()
+                self._last_arrival = now
+                self._parts.append(chunk)
+                self._size += len(chunk)
+                _STATS.buffered_bytes += len(chunk)
+                self._readable.set()
+                if self._size >= self._cfg.coalesce_max_bytes:
+                    self._flush.set()
+                if self._must_pause() and not await self._wait_for_client():
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            self._finished = True
+            self._flush.set()
+            self._readable.set()
+            aclose = getattr(self._source, "aclose", None)
+            if aclose is not None:
+                with suppress(Exception):
+                    await aclose()
+
+    async def _wait_for_client(self) -> bool:
+        """Pause upstream reads until the client catches up.
+
+        Returns `False` if the stream was given up on as a slow client.
+        """
+
+        cfg = self._cfg
+        self.paused = True
+        _STATS.paused += 1
+        self._writable.clear()
+        try:
+            if cfg.slow_client_policy == "wait":
+                await self._writable.wait()
+                return True
+            try:
+                await asyncio.wait_for(self._writable.wait(), cfg.slow_client_timeout_seconds)
+                return True
+            except TimeoutError:
+                pass
+        finally:
+            self.paused = False
+
+        _STATS.slow_clients += 1
+        logger.warning(
+            "slow client: %d bytes buffered for %.1fs; applying policy %r",
+            self._size,
+            cfg.slow_client_timeout_seconds,
+            cfg.slow_client_policy,
+        )
+        if cfg.slow_client_policy == "abort":
+            _STATS.aborted += 1
+            self._aborted = SlowClientAborted(
+                f"stream aborted: client did not read {self._size} buffered bytes "
+                f"within {cfg.slow_client_timeout_seconds}s"
+            )
+            # Free the buffer now: a stalled client may never resume `drain()`
+            # to reach its cleanup.
+            self._parts.clear()
+            self._release(self._size)
+            self._flush.set()
+            self._readable.set()
+        else:
+            _STATS.shed += 1
+            self._error = SlowClientAborted(
+                f"stream shed: client did not read buffered output within {cfg.slow_client_timeout_seconds}s"
+            )
+        return False
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import importlib.util
+from typing import Any
+
+import httpx
+
+
+_UNIX_SCHEME = "unix:"
+# Host used in request URLs for Unix-socket targets; the socket path decides
+# where bytes go, this only fills the Host header.
+_UDS_HOST = "http://localhost"
+
+
+@dataclass(frozen=True)
+class UpstreamTarget:
+    """One upstream `/chat/completions` server.
+
+    `base_url` is either `http(s)://host:port[/prefix]` or `unix:/path/to.sock`
+    for a server on the same host. With `http2`, many concurrent streams share
+    a few multiplexed connections: over `https` it is negotiated with ALPN,
+    over plain `http` and Unix sockets it is spoken with prior knowledge, so
+    the backend must accept cleartext HTTP/2 (h2c).
+    """
+
+    base_url: str
+    http2: bool = False
+
+    @property
+    def uds(self) -> str | None:
+        if self.base_url.startswith(_UNIX_SCHEME):
+            return self.base_url[len(_UNIX_SCHEME) :]
+        return None
+
+    def url_for(self, path: str) -> str:
+        base = _UDS_HOST if self.uds is not None else self.base_url
+        return base.rstrip("/") + "/" + path.lstrip("/")
+
+    def build_client(self, *, timeout: float, limits: httpx.Limits) -> httpx.AsyncClient:
+        prior_knowledge = self.http2 and not self.base_url.startswith("https:")
+        transport = None
+        if self.uds is not None or prior_knowledge:
+            transport = httpx.AsyncHTTPTransport(
+                uds=self.uds,
+                http1=not prior_knowledge,
+                http2=self.http2,
+                limits=limits,
+            )
+        return httpx.AsyncClient(
+            timeout=timeout, limits=limits, http2=self.http2, transport=transport
+        )
+
+
+def load_targets(llm_proxy_cfg: dict[str, Any], *, default_base_url: str) -> tuple[UpstreamTarget, ...]:
+    """Parse `llm_proxy.targets` (strings or `{base_url, http2}` tables)."""
+
+    default_http2 = llm_proxy_cfg.get("http2", False)
+    if not isinstance(default_http2, bool):
+        raise ValueError("Invalid config: llm_proxy.http2 must be boolean")
+
+    raw_targets = llm_proxy_cfg.get("targets") or [default_base_url]
+    if not isinstance(raw_targets, list):
+        raise ValueError("Invalid config: llm_proxy.targets must be a list")
+
+    targets: list[UpstreamTarget] = []
+    for raw in raw_targets:
+        if isinstance(raw, str):
+            raw = {"base_url": raw}
+        if not isinstance(raw, dict):
+            raise ValueError("Invalid config: llm_proxy.targets entries must be strings or tables")
+        base_url = raw.get("base_url")
+        http2 = raw.get("http2", default_http2)
+        if not isinstance(base_url, str) or not base_url.startswith(("http://", "https://", _UNIX_SCHEME)):
+            raise ValueError(
+                "Invalid config: llm_proxy.targets base_url must start with http://, https:// or unix:"
+            )
+        if base_url.startswith(_UNIX_SCHEME) and len(base_url) == len(_UNIX_SCHEME):
+            raise ValueError("Invalid config: llm_proxy.targets unix: base_url needs a socket path")
+        if not isinstance(http2, bool):
+            raise ValueError("Invalid config: llm_proxy.targets http2 must be boolean")
+        targets.append(UpstreamTarget(base_url=base_url, http2=http2))
+
+    if any(t.http2 for t in targets) and importlib.util.find_spec("h2") is None:
+        raise ValueError(
+            "Invalid config: http2 targets need the 'h2' package (install 'httpx[http2]')"
+        )
+    if len({t.base_url for t in targets}) != len(targets):
+        raise ValueError("Invalid config: llm_proxy.targets must not repeat a base_url")
+    return tuple(targets)
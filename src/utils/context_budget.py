@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import json
+from typing import Any, Mapping
+
+
+COMPACTION_POLICIES = ("drop_reasoning", "truncate_tool_outputs", "elide_middle")
+
+# Rough per-message framing cost (role markers, separators) in chat templates.
+_MESSAGE_OVERHEAD_TOKENS = 4
+# Flat estimate for one image part; matches a high-detail single tile upstream.
+_IMAGE_TOKENS = 765
+
+
+@dataclass(frozen=True)
+class ContextBudgetConfig:
+    """Per-model context limits and the compaction policies used to honor them.
+
+    A limit of `0` disables budgeting for that model.
+    """
+
+    default_limit: int = 0
+    model_limits: dict[str, int] = field(default_factory=dict)
+    reserve_output_tokens: int = 4096
+    policies: tuple[str, ...] = COMPACTION_POLICIES
+    keep_recent_messages: int = 8
+    tool_output_max_chars: int = 2000
+
+    def budget_for(self, model: str) -> int:
+        limit = self.model_limits.get(model, self.default_limit)
+        if limit <= 0:
+            return 0
+        return max(limit - self.reserve_output_tokens, 1)
+
+
+def load_context_budget_config(raw: Any) -> ContextBudgetConfig:
+    """Build a `ContextBudgetConfig` from the `[llm_proxy.context]` table."""
+
+    if raw is None:
+        return ContextBudgetConfig()
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid config: llm_proxy.context must be a table")
+
+    defaults = ContextBudgetConfig()
+    default_limit = raw.get("default_limit", defaults.default_limit)
+    reserve = raw.get("reserve_output_tokens", defaults.reserve_output_tokens)
+    keep_recent = raw.get("keep_recent_messages", defaults.keep_recent_messages)
+    tool_max = raw.get("tool_output_max_chars", defaults.tool_output_max_chars)
+    policies = raw.get("policies", list(defaults.policies))
+    models = raw.get("models", {})
+
+    for name, value in (
+        ("default_limit", default_limit),
+        ("reserve_output_tokens", reserve),
+        ("keep_recent_messages", keep_recent),
+        ("tool_output_max_chars", tool_max),
+    ):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"Invalid config: llm_proxy.context.{name} must be an integer >= 0")
+    if not isinstance(policies, list) or any(p not in COMPACTION_POLICIES for p in policies):
+        raise ValueError(
+            f"Invalid config: llm_proxy.context.policies must be a subset of {list(COMPACTION_POLICIES)}"
+        )
+    if not isinstance(models, dict) or any(
+        not isinstance(v, int) or isinstance(v, bool) or v < 0 for v in models.values()
+    ):
+        raise ValueError("Invalid config: llm_proxy.context.models must map model names to integers")
+
+    return ContextBudgetConfig(
+        default_limit=default_limit,
+        model_limits=dict(models),
+        reserve_output_tokens=reserve,
+        policies=tuple(policies),
+        keep_recent_messages=keep_recent,
+        tool_output_max_chars=tool_max,
+    )
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Tokenizer-free estimate: ~4 chars per token for ASCII, ~1 per wide char."""
+
+    if not text:
+        return 0
+    if text.isascii():
+        return (len(text) + 3) // 4
+    n_chars = len(text)
+    # Multi-byte characters (CJK, emoji) carry 1-3 extra UTF-8 bytes each and
+    # tokenize far denser than English text.
+    wide = min((len(text.encode("utf-8")) - n_chars + 1) // 2, n_chars)
+    return (n_chars - wide + 3) // 4 + wide
+
+
+class TokenEstimator:
+    """Estimate chat message sizes.
+
+    Messages are counted afresh on every request: for ASCII text the estimate
+    is a length check, cheaper than hashing the message for a cache lookup,
+    and nothing has to hold old message bodies alive.
+    """
+
+    def __init__(self) -> None:
+        self.messages = 0
+
+    def count_message(self, message: Mapping[str, Any]) -> int:
+        self.messages += 1
+        return _estimate_message_tokens(message)
+
+    def count_messages(self, messages: list[Any]) -> int:
+        return sum(self.count_message(m) for m in messages)
+
+    def count_tools(self, tools_json: bytes) -> int:
+        if tools_json.isascii():
+            return (len(tools_json) + 3) // 4
+        return estimate_text_tokens(tools_json.decode("utf-8"))
+
+
+def fit_chat_payload_to_budget(
+    chat_payload: dict[str, Any],
+    *,
+    config: ContextBudgetConfig,
+    estimator: TokenEstimator,
+    tools_json: bytes | None = None,
+) -> dict[str, Any]:
+    """Compact `chat_payload["messages"]` in place so the prompt fits the model budget.
+
+    Policies run in configured order and stop as soon as the prompt fits. The
+    system message and the most recent `keep_recent_messages` are never touched.
+    `tools_json` is the already-encoded `tools` list, if the caller has it.
+    Raises `ValueError` if the prompt still does not fit afterwards.
+    """
+
+    model = chat_payload.get("model", "")
+    budget = config.budget_for(model)
+    if budget <= 0:
+        return chat_payload
+
+    messages: list[dict[str, Any]] = chat_payload["messages"]
+    tools = chat_payload.get("tools")
+    if tools_json is None and isinstance(tools, list):
+        tools_json = json.dumps(tools, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    fixed = estimator.count_tools(tools_json) if tools_json is not None else 0
+
+    total = fixed + estimator.count_messages(messages)
+    if total <= budget:
+        return chat_payload
+
+    groups = _group_messages(messages)
+    first_recent = _first_recent_group(groups, config.keep_recent_messages)
+
+    for policy in config.policies:
+        if policy == "drop_reasoning":
+            _drop_reasoning(groups, first_recent)
+        elif policy == "truncate_tool_outputs":
+            _truncate_tool_outputs(groups, first_recent, max_chars=config.tool_output_max_chars)
+        elif policy == "elide_middle":
+            groups, first_recent = _elide_middle(
+                groups, first_recent, budget=budget - fixed, estimator=estimator
+            )
+        total = fixed + sum(estimator.count_messages(g) for g in groups)
+        if total <= budget:
+            break
+
+    if total > budget:
+        raise ValueError(
+            f"Request exceeds the context window for model {model!r}: "
+            f"~{total} tokens after compaction, budget is {budget}"
+        )
+
+    chat_payload["messages"] = [m for g in groups for m in g]
+    return chat_payload
+
+
+def _group_messages(messages: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+    """Split messages into groups that must be kept or dropped together.
+
+    A `tool` message always belongs to the assistant message that issued the
+    call, otherwise upstream rejects the history as malformed.
+    """
+
+    groups: list[list[dict[str, Any]]] = []
+    for msg in messages:
+        if msg.get("role") == "tool" and groups:
+            groups[-1].append(msg)
+        else:
+            groups.append([msg])
+    return groups
+
+
+def _first_recent_group(groups: list[list[dict[str, Any]]], keep_recent: int) -> int:
+    kept = 0
+    index = len(groups)
+    while index > 1 and kept < keep_recent:
+        index -= 1
+        kept += len(groups[index])
+    return index
+
+
+def _drop_reasoning(groups: list[list[dict[str, Any]]], first_recent: int) -> None:
+    # The formatter currently drops `reasoning` input items; this strips any
+    # reasoning attached to older assistant turns (see schema/response/index.md).
+    for group in groups[1:first_recent]:
+        for i, msg in enumerate(group):
+            if msg.get("role") == "assistant" and ("reasoning_content" in msg or "reasoning" in msg):
+                group[i] = {k: v for k, v in msg.items() if k not in ("reasoning_content", "reasoning")}
+
+
+def _truncate_tool_outputs(
+    groups: list[list[dict[str, Any]]], first_recent: int, *, max_chars: int
+) -> None:
+    for group in groups[1:first_recent]:
+        for i, msg in enumerate(group):
+            content = msg.get("content")
+            if msg.get("role") != "tool" or not isinstance(content, str) or len(content) <= max_chars:
+                continue
+            omitted = len(content) - max_chars
+            group[i] = {**msg, "content": content[:max_chars] + f"\n...[{omitted} chars truncated]"}
+
+
+def _elide_middle(
+    groups: list[list[dict[str, Any]]],
+    first_recent: int,
+    *,
+    budget: int,
+    estimator: TokenEstimator,
+) -> tuple[list[list[dict[str, Any]]], int]:
+    # Keep the system prompt and the opening user turn (the task statement);
+    # drop the oldest turns after it until the remainder fits.
+    head = 2 if first_recent > 2 and groups[1][0].get("role") == "user" else 1
+    total = sum(estimator.count_messages(g) for g in groups)
+    cut = head
+    while cut < first_recent and total > budget:
+        total -= estimator.count_messages(groups[cut])
+        cut += 1
+    if cut == head:
+        return groups, first_recent
+    return groups[:head] + groups[cut:], first_recent - (cut - head)
+
+
+def _estimate_message_tokens(message: Mapping[str, Any]) -> int:
+    count = _MESSAGE_OVERHEAD_TOKENS
+    for field_name in ("content", "reasoning_content"):
+        content = message.get(field_name)
+        if isinstance(content, str):
+            count += estimate_text_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if not isinstance(part, dict):
+                    continue
+                if part.get("type") == "text" and isinstance(part.get("text"), str):
+                    count += estimate_text_tokens(part["text"])
+                elif part.get("type") == "image_url":
+                    count += _IMAGE_TOKENS
+    tool_calls = message.get("tool_calls")
+    if isinstance(tool_calls, list):
+        for call in tool_calls:
+            fn = call.get("function") if isinstance(call, dict) else None
+            if isinstance(fn, dict):
+                count += _MESSAGE_OVERHEAD_TOKENS
+                count += estimate_text_tokens(str(fn.get("name", "")))
+                count += estimate_text_tokens(str(fn.get("arguments", "")))
+    return count
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import json
+from typing import Any, Callable, Hashable
+
+
+def _dumps(value: Any) -> str:
+    # Same encoding httpx uses for `json=` bodies.
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+
+class FragmentCache:
+    """Bounded LRU of pre-serialized JSON fragments for repeated payload parts.
+
+    Codex sends the same `instructions` prompt on every turn. Each distinct
+    prompt is encoded once; later requests splice in the interned bytes
+    instead of encoding their own copy.
+    """
+
+    def __init__(self, *, max_entries: int = 128, max_bytes: int = 8 * 1024 * 1024) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[bytes, int]] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def instructions_fragment(self, instructions: str) -> bytes:
+        # Keyed by the prompt itself, which the cache then also keeps alive.
+        return self._lookup(
+            ("instructions", instructions),
+            lambda: _dumps(instructions).encode("utf-8"),
+            key_bytes=len(instructions),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _lookup(self, key: Hashable, build: Callable[[], bytes], *, key_bytes: int = 0) -> bytes:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        fragment = build()
+        cost = len(fragment) + key_bytes
+        if cost > self._max_bytes:
+            return fragment
+        self._entries[key] = (fragment, cost)
+        self._size += cost
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            _, (_, evicted_cost) = self._entries.popitem(last=False)
+            self._size -= evicted_cost
+            self.evictions += 1
+        return fragment
+
+
+def encode_json(value: Any) -> bytes:
+    """Encode `value` exactly as it appears inside an encoded chat payload."""
+
+    return _dumps(value).encode("utf-8")
+
+
+def encode_chat_payload(
+    chat_payload: dict[str, Any], *, fragments: FragmentCache, tools_json: bytes | None = None
+) -> bytes:
+    """Serialize a `/chat/completions` payload, splicing in cached fragments.
+
+    Produces the same JSON document as `json.dumps(chat_payload)`; the system
+    prompt is copied from `fragments` instead of being encoded again, and
+    `tools_json` (from `encode_json`, when the caller already needed it) is
+    used for `tools`.
+    """
+
+    out: list[bytes] = []
+    for key, value in chat_payload.items():
+        if key == "messages":
+            encoded = _encode_messages(value, fragments=fragments)
+        elif key == "tools" and tools_json is not None:
+            encoded = tools_json
+        else:
+            encoded = _dumps(value).encode("utf-8")
+        out.append(_dumps(key).encode("utf-8") + b":" + encoded)
+    return b"{" + b",".join(out) + b"}"
+
+
+def _encode_messages(messages: list[Any], *, fragments: FragmentCache) -> bytes:
+    if not messages:
+        return b"[]"
+    first = messages[0]
+    if (
+        isinstance(first, dict)
+        and len(first) == 2
+        and first.get("role") == "system"
+        and isinstance(first.get("content"), str)
+    ):
+        head = b'{"role":"system","content":' + fragments.instructions_fragment(first["content"]) + b"}"
+        if len(messages) == 1:
+            return b"[" + head + b"]"
+        return b"[" + head + b"," + _dumps(messages[1:]).encode("utf-8")[1:]
+    return _dumps(messages).encode("utf-8")
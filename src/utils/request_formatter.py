@@ -40,7 +40,9 @@ class _ChatToolMessage(TypedDict):
 ChatCompletionMessageParam = _ChatSystemMessage | _ChatAssistantMessage | _ChatUserMessage | _ChatToolMessage
 
 
-def format_response_request(*, response_payload: dict[str, Any]) -> dict[str, Any]:
+def format_response_request(
+    *, response_payload: dict[str, Any], history: InputHistory | None = None
+) -> dict[str, Any]:
     """Convert public `/response` payload into OpenAI-style `/chat/completions` payload.
 
     Contract source of truth: `schema/response/index.md`.
@@ -48,6 +50,8 @@ def format_response_request(*, response_payload: dict[str, Any]) -> dict[str, An
     Notes:
     - This function only *formats*; it does not perform any network I/O.
     - Unknown fields are ignored and are not forwarded upstream.
+    - With `history`, input items already translated on an earlier turn of the
+      same conversation are reused instead of translated again.
     """
 
     model = response_payload.get("model")
@@ -68,22 +72,11 @@ def format_response_request(*, response_payload: dict[str, Any]) -> dict[str, An
     messages: list[ChatCompletionMessageParam] = []
     messages.append({"role": "system", "content": instructions})
 
-    for item in input_items:
-        if not isinstance(item, dict):
-            raise ValueError("Invalid input item: expected object")
-
-        item_type = item.get("type")
-        if item_type == "message":
-            messages.extend(_format_message_item(item))
-        elif item_type == "function_call":
-            messages.append(_format_function_call_item(item))
-        elif item_type == "function_call_output":
-            messages.append(_format_function_call_output_item(item))
-        elif item_type == "reasoning":
-            # Best-effort: ignore in Phase2; caller can decide how to surface it.
-            continue
-        else:
-            raise ValueError(f"Unsupported input item type: {item_type!r}")
+    if history is not None:
+        messages.extend(history.translate(input_items))
+    else:
+        for item in input_items:
+            messages.extend(_format_input_item(item))
 
     chat_payload: dict[str, Any] = {
         "model": model,
@@ -103,6 +96,55 @@ def format_response_request(*, response_payload: dict[str, Any]) -> dict[str, An
     return chat_payload
 
 
+class InputHistory:
+    """Translated messages for one conversation's input items, kept across turns.
+
+    Each turn's `input` usually repeats the previous turn's items and appends
+    a few; the longest unchanged prefix is served from the cache. Returned
+    message dicts are shared with the cache and must not be mutated.
+    """
+
+    def __init__(self) -> None:
+        self._items: list[Any] = []
+        self._messages: list[list[ChatCompletionMessageParam]] = []
+        self.reused = 0
+        self.translated = 0
+
+    def translate(self, input_items: list[Any]) -> list[ChatCompletionMessageParam]:
+        keep = 0
+        limit = min(len(input_items), len(self._items))
+        while keep < limit and (
+            input_items[keep] is self._items[keep] or input_items[keep] == self._items[keep]
+        ):
+            keep += 1
+        del self._items[keep:]
+        del self._messages[keep:]
+
+        for item in input_items[keep:]:
+            self._messages.append(_format_input_item(item))
+            self._items.append(item)
+        self.reused += keep
+        self.translated += len(input_items) - keep
+        return [m for item_messages in self._messages for m in item_messages]
+
+
+def _format_input_item(item: Any) -> list[ChatCompletionMessageParam]:
+    if not isinstance(item, dict):
+        raise ValueError("Invalid input item: expected object")
+
+    item_type = item.get("type")
+    if item_type == "message":
+        return _format_message_item(item)
+    if item_type == "function_call":
+        return [_format_function_call_item(item)]
+    if item_type == "function_call_output":
+        return [_format_function_call_output_item(item)]
+    if item_type == "reasoning":
+        # Best-effort: ignore in Phase2; caller can decide how to surface it.
+        return []
+    raise ValueError(f"Unsupported input item type: {item_type!r}")
+
+
 def _format_message_item(item: dict[str, Any]) -> list[ChatCompletionMessageParam]:
     role = item.get("role")
     if role not in ("user", "assistant"):
@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _reset_upstream_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Upstream clients are pooled per process; start each test without them so
+    # monkeypatched `httpx.AsyncClient` fakes are picked up.
+    from services import llm_proxy
+
+    monkeypatch.setattr(llm_proxy, "_CLIENTS", {})
@@ -0,0 +1,80 @@
+import marshal
+
+import pytest
+
+
+@pytest.fixture
+def admin_client(monkeypatch: pytest.MonkeyPatch):
+    from fastapi.testclient import TestClient
+
+    import admin
+    from main import app
+
+    monkeypatch.setattr(admin, "_CONFIG", admin._AdminConfig(enabled=True, token="secret"))
+    return TestClient(app, headers={"x-admin-token": "secret"})
+
+
+def test_admin_endpoints_are_hidden_when_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    from fastapi.testclient import TestClient
+
+    import admin
+    from main import app
+
+    monkeypatch.setattr(admin, "_CONFIG", admin._AdminConfig())
+    assert TestClient(app).get("/admin/tasks").status_code == 404
+
+
+def test_admin_endpoints_require_token(admin_client) -> None:
+    resp = admin_client.get("/admin/tasks", headers={"x-admin-token": "wrong"})
+    assert resp.status_code == 403
+
+
+def test_admin_tasks_dumps_stacks(admin_client) -> None:
+    resp = admin_client.get("/admin/tasks")
+    assert resp.status_code == 200
+    assert "Task " in resp.text
+
+
+def test_admin_profile_returns_pstats_dump(admin_client) -> None:
+    resp = admin_client.post("/admin/profile", params={"seconds": 0.05, "mode": "cprofile"})
+    assert resp.status_code == 200
+    assert isinstance(marshal.loads(resp.content), dict)
+
+
+def test_admin_profile_returns_collapsed_stacks(admin_client) -> None:
+    resp = admin_client.post("/admin/profile", params={"seconds": 0.05, "interval_ms": 1})
+    assert resp.status_code == 200
+    for line in resp.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+
+def test_admin_memory_reports_allocations(admin_client) -> None:
+    resp = admin_client.post("/admin/memory", params={"seconds": 0.01, "top": 5})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body["allocations"]) <= 5
+    assert body["streams"] == []
+
+
+def test_enabling_admin_requires_a_token(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from admin import load_admin_config
+
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    path = tmp_path / "project.toml"
+    path.write_text("[admin]\nenabled = true\n")
+    with pytest.raises(ValueError, match="admin.token"):
+        load_admin_config(path)
+
+    monkeypatch.setenv("ADMIN_TOKEN", "from-env")
+    assert load_admin_config(path).token == "from-env"
+
+
+def test_admin_rejects_empty_token_even_from_loopback(monkeypatch: pytest.MonkeyPatch) -> None:
+    from fastapi.testclient import TestClient
+
+    import admin
+    from main import app
+
+    monkeypatch.setattr(admin, "_CONFIG", admin._AdminConfig(enabled=True, token=""))
+    assert TestClient(app, client=("127.0.0.1", 1234)).get("/admin/tasks").status_code == 403
@@ -5,6 +5,8 @@ def test_app_importable() -> None:
 
 
 def test_post_response_proxies_and_returns_parsed_response(monkeypatch) -> None:
+    import json
+
     from fastapi.testclient import TestClient
 
     from main import app
@@ -39,10 +41,11 @@ def test_post_response_proxies_and_returns_parsed_response(monkeypatch) -> None:
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-        def stream(self, method: str, url: str, *, json: dict | None = None):
+        def stream(self, method: str, url: str, *, content: bytes, headers: dict):
             captured["method"] = method
             captured["url"] = url
-            captured["json"] = json
+            captured["headers"] = headers
+            captured["json"] = json.loads(content)
 
             class _StreamCtx:
                 status_code = 200
@@ -71,4 +74,72 @@ def test_post_response_proxies_and_returns_parsed_response(monkeypatch) -> None:
 
     assert captured["method"] == "POST"
     assert captured["url"] == "http://localhost:8001/chat/completions"
+    assert captured["headers"] == {"content-type": "application/json"}
     assert captured["json"] == expected_outbound
+
+
+def test_metrics_endpoint_reports_fragment_cache() -> None:
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    client = TestClient(app)
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert set(resp.json()["payload_fragments"]) >= {"hits", "misses", "evictions"}
+
+
+def test_response_websocket_keeps_session_across_turns(monkeypatch) -> None:
+    import json
+
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    def user(text: str) -> dict:
+        return {"type": "message", "role": "user", "content": [{"type": "input_text", "text": text}]}
+
+    sent: list[dict] = []
+
+    class FakeAsyncClient:
+        def __init__(self, *args, **kwargs):
+            return
+
+        def stream(self, method: str, url: str, *, content: bytes, headers: dict):
+            sent.append(json.loads(content))
+
+            class _StreamCtx:
+                async def __aenter__(self_inner):
+                    return self_inner
+
+                async def __aexit__(self_inner, exc_type, exc, tb):
+                    return False
+
+                def raise_for_status(self_inner) -> None:
+                    return
+
+                async def aiter_bytes(self_inner):
+                    yield b"data: hi\n\n"
+
+            return _StreamCtx()
+
+    monkeypatch.setattr("services.llm_proxy.httpx.AsyncClient", FakeAsyncClient)
+
+    with TestClient(app).websocket_connect("/response") as ws:
+        ws.send_json({"model": "m", "instructions": "i", "input": [user("a")]})
+        assert ws.receive_bytes() == b"data: hi\n\n"
+        done = ws.receive_json()
+        assert done["type"] == "response.done"
+
+        ws.send_json({"model": "m", "instructions": "i", "input": [user("b")], "previous_response_id": "nope"})
+        assert ws.receive_json()["status"] == 400
+        ws.send_bytes(b"\xff not json")
+        assert ws.receive_json()["status"] == 400
+
+        ws.send_json(
+            {"model": "m", "instructions": "i", "input": [user("b")], "previous_response_id": done["response_id"]}
+        )
+        assert ws.receive_bytes() == b"data: hi\n\n"
+        assert ws.receive_json()["type"] == "response.done"
+
+    assert [m["content"] for m in sent[1]["messages"]] == ["i", "a", "b"]
@@ -0,0 +1,67 @@
+import socket
+
+import pytest
+
+
+def test_load_server_config_defaults(tmp_path) -> None:
+    from server import ServerConfig, load_server_config
+
+    assert load_server_config(tmp_path / "missing.toml") == ServerConfig()
+
+
+def test_load_server_config_reads_server_table(tmp_path) -> None:
+    from server import load_server_config
+
+    path = tmp_path / "project.toml"
+    path.write_text('[server]\nport = 9000\nworkers = 4\nloop = "asyncio"\nbacklog = 4096\n')
+
+    cfg = load_server_config(path)
+    assert cfg.port == 9000
+    assert cfg.workers == 4
+    assert cfg.loop == "asyncio"
+    assert cfg.backlog == 4096
+
+
+def test_load_server_config_rejects_unknown_loop(tmp_path) -> None:
+    from server import load_server_config
+
+    path = tmp_path / "project.toml"
+    path.write_text('[server]\nloop = "trio"\n')
+
+    with pytest.raises(ValueError):
+        load_server_config(path)
+
+
+def test_bind_socket_sets_reuse_port_without_listening() -> None:
+    from server import ServerConfig, bind_socket
+
+    sock = bind_socket(ServerConfig(port=0), reuse_port=True)
+    try:
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT) == 1
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_ACCEPTCONN) == 0
+    finally:
+        sock.close()
+
+
+def test_supervisor_exits_when_workers_fail_during_startup() -> None:
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    server_py = Path(__file__).resolve().parents[1] / "src" / "server.py"
+    busy = socket.socket()
+    busy.bind(("127.0.0.1", 0))
+    busy.listen()
+    try:
+        port = busy.getsockname()[1]
+        result = subprocess.run(
+            [sys.executable, str(server_py), "--port", str(port), "--workers", "2"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    finally:
+        busy.close()
+
+    assert result.returncode == 1
+    assert "failed during startup" in result.stderr
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+
+def _policy(**overrides):
+    from services.hedging import HedgeConfig, HedgePolicy
+
+    values = {"enabled": True, "initial_delay_ms": 20, "min_delay_ms": 1, "budget_percent": 100}
+    values.update(overrides)
+    return HedgePolicy(HedgeConfig(**values))
+
+
+class _Opener:
+    def __init__(self, delays: dict[str, float]) -> None:
+        self.delays = delays
+        self.cancelled: list[str] = []
+        self.closed: list[str] = []
+
+    async def open(self, target: str) -> str:
+        try:
+            await asyncio.sleep(self.delays[target])
+        except asyncio.CancelledError:
+            self.cancelled.append(target)
+            raise
+        return target
+
+    async def close(self, opened: str) -> None:
+        self.closed.append(opened)
+
+
+@pytest.mark.asyncio
+async def test_hedged_open_returns_fast_primary_without_hedging() -> None:
+    from services.hedging import hedged_open
+
+    policy = _policy()
+    opener = _Opener({"a": 0.0, "b": 0.0})
+    result = await hedged_open(opener.open, ["a", "b"], model="m", policy=policy, close=opener.close)
+
+    assert result == "a"
+    assert policy.stats()["hedges_fired"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hedged_open_switches_to_faster_target_and_cancels_loser() -> None:
+    from services.hedging import hedged_open
+
+    policy = _policy()
+    opener = _Opener({"a": 1.0, "b": 0.0})
+    result = await hedged_open(opener.open, ["a", "b"], model="m", policy=policy, close=opener.close)
+
+    assert result == "b"
+    assert opener.cancelled == ["a"]
+    assert policy.stats()["hedges_fired"] == 1
+    assert policy.stats()["hedges_won"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_open_respects_budget() -> None:
+    from services.hedging import hedged_open
+
+    policy = _policy(budget_percent=0)
+    opener = _Opener({"a": 0.05, "b": 0.0})
+    result = await hedged_open(opener.open, ["a", "b"], model="m", policy=policy, close=opener.close)
+
+    assert result == "a"
+    assert policy.stats()["hedges_fired"] == 0
+    assert policy.stats()["hedges_skipped_budget"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_open_skips_hedge_without_capacity() -> None:
+    from services.hedging import hedged_open
+
+    policy = _policy()
+    opener = _Opener({"a": 0.05, "b": 0.0})
+    result = await hedged_open(
+        opener.open, ["a", "b"], model="m", policy=policy, close=opener.close, reserve=lambda: False
+    )
+
+    assert result == "a"
+    assert policy.stats()["hedges_fired"] == 0
+    assert policy.stats()["hedges_skipped_capacity"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_open_skips_models_not_enabled() -> None:
+    from services.hedging import hedged_open
+
+    policy = _policy(models=("other",))
+    opener = _Opener({"a": 0.05, "b": 0.0})
+    result = await hedged_open(opener.open, ["a", "b"], model="m", policy=policy, close=opener.close)
+
+    assert result == "a"
+    assert policy.stats()["requests"] == 0
+
+
+def test_hedge_delay_tracks_ttft_percentile() -> None:
+    policy = _policy(percentile=90, min_delay_ms=0)
+    assert policy.delay_for("m") == pytest.approx(0.02)
+
+    for i in range(100):
+        policy.record_ttft("m", (i + 1) / 1000.0)
+    assert policy.delay_for("m") == pytest.approx(0.091)
@@ -1,3 +1,6 @@
+import asyncio
+import json
+
 import pytest
 
 
@@ -36,9 +39,9 @@ async def test_proxy_response_formats_and_posts(monkeypatch: pytest.MonkeyPatch)
         async def __aexit__(self, exc_type, exc, tb):
             return False
 
-        async def post(self, url: str, *, json: dict | None = None):
+        async def post(self, url: str, *, content: bytes, headers: dict):
             captured["url"] = url
-            captured["json"] = json
+            captured["json"] = json.loads(content)
             return FakeResponse()
 
     monkeypatch.setattr("services.llm_proxy.format_response_request", fake_format_response_request)
@@ -49,3 +52,92 @@ async def test_proxy_response_formats_and_posts(monkeypatch: pytest.MonkeyPatch)
     assert captured["formatted_from"] == {"model": "x", "instructions": "y", "input": []}
     assert captured["url"] == "http://localhost:8001/chat/completions"
     assert captured["json"] == {"model": "m", "messages": [{"role": "system", "content": "i"}], "stream": False}
+
+
+@pytest.mark.asyncio
+async def test_upstream_client_is_pooled_per_process(monkeypatch: pytest.MonkeyPatch) -> None:
+    from services import llm_proxy
+
+    created: list[object] = []
+
+    class FakeAsyncClient:
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            self.closed = False
+
+        async def aclose(self) -> None:
+            self.closed = True
+
+    monkeypatch.setattr("services.llm_proxy.httpx.AsyncClient", FakeAsyncClient)
+
+    await llm_proxy.start_upstream_pool()
+    cfg = llm_proxy._load_config()
+    assert llm_proxy._get_client(cfg) is llm_proxy._get_client(cfg)
+    assert len(created) == 1
+
+    await llm_proxy.close_upstream_pool()
+    assert created[0].closed is True
+    assert llm_proxy._CLIENTS == {}
+
+
+class _DelayedStreamClient:
+    """Fake upstream whose first chunk arrives after `delay` seconds."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    def stream(self, method: str, url: str, *, content: bytes, headers: dict):
+        delay = self.delay
+
+        class _StreamCtx:
+            async def __aenter__(self_inner):
+                return self_inner
+
+            async def __aexit__(self_inner, exc_type, exc, tb):
+                return False
+
+            def raise_for_status(self_inner) -> None:
+                return
+
+            async def aiter_bytes(self_inner):
+                await asyncio.sleep(delay)
+                yield b"data: x\n\n"
+
+        return _StreamCtx()
+
+
+@pytest.mark.asyncio
+async def test_won_hedge_is_charged_to_the_target_that_serves_it() -> None:
+    from services.hedging import HedgeConfig, HedgePolicy
+    from services.llm_proxy import _stream_chat_completions
+    from services.routing import ConsistentHashRing
+
+    router = ConsistentHashRing(["a", "b"], virtual_nodes=8, load_factor=1.25)
+    stream = _stream_chat_completions(
+        upstreams={"a": (_DelayedStreamClient(5), "http://a"), "b": (_DelayedStreamClient(0), "http://b")},
+        body=b"{}",
+        model="m",
+        hedge_policy=HedgePolicy(
+            HedgeConfig(enabled=True, initial_delay_ms=10, min_delay_ms=1, budget_percent=100)
+        ),
+        router=router,
+    )
+
+    assert await stream.__anext__() == b"data: x\n\n"
+    assert router.in_flight == {"a": 0, "b": 1}
+    await stream.aclose()
+    assert router.in_flight == {"a": 0, "b": 0}
+
+
+def test_token_meter_counts_split_events_and_skips_done() -> None:
+    from services.llm_proxy import _TokenMeter
+
+    meter = _TokenMeter(None, None)  # type: ignore[arg-type]
+    chunks = [b'data: {"a":1}\n\nda', b'ta: {"a":2}\n', b'\ndata: {"a":3}\n\ndata: [DONE]\n\n']
+    assert [meter.count(c) for c in chunks] == [1, 0, 2]
+
+    crlf = [b'data: {"a":1}\r\n\r\ndata: {"a":2}\r\n\r', b'\ndata: [DONE]\r\n\r\n']
+    assert [meter.count(c) for c in crlf] == [1, 1]
+
+    assert meter.count(b"data: " + b"x" * 100_000) == 0
+    assert meter.count(b"\n\ndata: {}\n\n") == 1
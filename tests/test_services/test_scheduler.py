@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+
+def _scheduler(clock=None, **overrides):
+    from services.scheduler import FairShareScheduler, load_fair_share_config
+
+    raw = {"enabled": True, "max_concurrent": 1, **overrides}
+    if clock is None:
+        return FairShareScheduler(load_fair_share_config(raw))
+    return FairShareScheduler(load_fair_share_config(raw), clock=clock)
+
+
+def test_identify_hashes_api_keys_and_reads_priority() -> None:
+    scheduler = _scheduler()
+
+    client_id, priority = scheduler.identify({"authorization": "Bearer sk-secret"})
+    assert client_id.startswith("key:") and "secret" not in client_id
+    assert priority == "interactive"
+    assert scheduler.identify({"x-client-id": "batch", "x-priority": "bulk"}) == ("batch", "bulk")
+    assert scheduler.identify(None) == ("anonymous", "interactive")
+
+
+def test_identify_prefers_credentials_over_client_id() -> None:
+    scheduler = _scheduler(client_headers=["x-client-id", "authorization"])
+
+    keyed, _ = scheduler.identify({"authorization": "Bearer sk-secret"})
+    assert scheduler.identify({"authorization": "Bearer sk-secret", "x-client-id": "spoof-1"})[0] == keyed
+    assert scheduler.identify({"authorization": "Bearer sk-secret", "x-client-id": "spoof-2"})[0] == keyed
+    assert scheduler.identify({"x-client-id": "spoof-1"})[0] == "spoof-1"
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_interactive_first_then_fairly() -> None:
+    scheduler = _scheduler()
+    holder = scheduler.admit({"x-client-id": "holder"})
+    await scheduler.acquire(holder)
+
+    order: list[str] = []
+
+    async def run(client: str, priority: str = "interactive") -> None:
+        ticket = scheduler.admit({"x-client-id": client, "x-priority": priority})
+        await scheduler.acquire(ticket)
+        order.append(client)
+        scheduler.release(ticket)
+
+    tasks = [asyncio.create_task(run("batch", "bulk"))]
+    tasks += [asyncio.create_task(run("heavy")) for _ in range(3)]
+    tasks.append(asyncio.create_task(run("light")))
+    await asyncio.sleep(0)
+
+    scheduler.release(holder)
+    await asyncio.gather(*tasks)
+
+    assert order[:2] == ["heavy", "light"]
+    assert order[-1] == "batch"
+    assert scheduler.stats()["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_try_acquire_takes_only_free_slots() -> None:
+    scheduler = _scheduler(max_concurrent=2)
+    ticket = scheduler.admit(None)
+    await scheduler.acquire(ticket)
+
+    assert scheduler.try_acquire(ticket) is True
+    assert scheduler.try_acquire(ticket) is False
+    scheduler.release(ticket)
+    scheduler.release(ticket)
+    assert scheduler.stats()["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot() -> None:
+    scheduler = _scheduler()
+    holder = scheduler.admit(None)
+    await scheduler.acquire(holder)
+
+    waiter = asyncio.create_task(scheduler.acquire(scheduler.admit(None)))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    scheduler.release(holder)
+    stats = scheduler.stats()
+    assert (stats["in_use"], stats["waiting"]) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_requests_and_paces_tokens() -> None:
+    from services.scheduler import ThrottledError
+
+    now = [0.0]
+    scheduler = _scheduler(
+        clock=lambda: now[0],
+        requests_per_second=1,
+        request_burst=2,
+        tokens_per_second=1000,
+        token_burst=10,
+    )
+    headers = {"x-client-id": "c"}
+
+    ticket = scheduler.admit(headers)
+    scheduler.admit(headers)
+    with pytest.raises(ThrottledError) as excinfo:
+        scheduler.admit(headers)
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.retry_after == pytest.approx(1.0)
+
+    now[0] = 1.0
+    scheduler.admit(headers)
+
+    await scheduler.consume_tokens(ticket, 10)
+    await scheduler.consume_tokens(ticket, 5)
+    client = scheduler.stats()["clients"]["c"]
+    assert client["rate_limited"] == 1
+    assert client["tokens"] == 15
+    assert client["throttled_seconds"] == pytest.approx(0.005)
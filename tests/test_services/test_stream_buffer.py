@@ -0,0 +1,173 @@
+import asyncio
+
+import pytest
+
+
+def _config(window: float, max_bytes: int, **overrides):
+    from services.stream_buffer import StreamBufferConfig
+
+    values = {
+        "coalesce_window_seconds": window,
+        "coalesce_max_bytes": max_bytes,
+        "high_watermark_bytes": max(max_bytes, 1 << 20),
+    }
+    values.update(overrides)
+    return StreamBufferConfig(**values)
+
+
+async def _source(chunks: list[bytes], *, delay: float = 0.0):
+    for chunk in chunks:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+@pytest.mark.asyncio
+async def test_buffer_stream_merges_bursts() -> None:
+    from services.stream_buffer import buffer_stream
+
+    chunks = [b"data: %d\n\n" % i for i in range(50)]
+    writes = [w async for w in buffer_stream(_source(chunks), config=_config(0.05, 1 << 20))]
+
+    assert b"".join(writes) == b"".join(chunks)
+    assert len(writes) == 1
+
+
+@pytest.mark.asyncio
+async def test_buffer_stream_respects_max_bytes() -> None:
+    from services.stream_buffer import buffer_stream
+
+    chunks = [b"x" * 10 for _ in range(20)]
+    writes = [w async for w in buffer_stream(_source(chunks), config=_config(0.05, 30))]
+
+    assert b"".join(writes) == b"".join(chunks)
+    assert all(len(w) <= 30 for w in writes)
+
+
+@pytest.mark.asyncio
+async def test_buffer_stream_flushes_slow_streams_immediately() -> None:
+    from services.stream_buffer import buffer_stream
+
+    chunks = [b"a", b"b", b"c"]
+    writes = [w async for w in buffer_stream(_source(chunks, delay=0.03), config=_config(0.005, 1024))]
+
+    assert writes == chunks
+
+
+@pytest.mark.asyncio
+async def test_buffer_stream_closes_source_when_abandoned() -> None:
+    from services.stream_buffer import buffer_stream
+
+    closed = asyncio.Event()
+
+    async def source():
+        try:
+            while True:
+                yield b"tick"
+                await asyncio.sleep(0.001)
+        finally:
+            closed.set()
+
+    stream = buffer_stream(source(), config=_config(0.02, 1024))
+    assert await stream.__anext__() == b"tick"
+    await stream.__anext__()
+    await stream.aclose()
+    assert closed.is_set()
+
+
+def _endless(produced: list[int], closed: asyncio.Event, *, size: int = 100):
+    async def source():
+        try:
+            while True:
+                produced.append(size)
+                yield b"x" * size
+                await asyncio.sleep(0)
+        finally:
+            closed.set()
+
+    return source()
+
+
+@pytest.mark.asyncio
+async def test_buffer_stream_pauses_upstream_at_high_watermark() -> None:
+    from services.stream_buffer import buffer_stream, inflight_buffers
+
+    produced: list[int] = []
+    closed = asyncio.Event()
+    config = _config(0, 100, high_watermark_bytes=1000, low_watermark_bytes=200, slow_client_policy="wait")
+    stream = buffer_stream(_endless(produced, closed), config=config)
+
+    await stream.__anext__()
+    await asyncio.sleep(0.05)
+    assert sum(produced) <= 1000 + 100 * 2
+    assert inflight_buffers()[0]["paused"] is True
+
+    # Draining below the low watermark resumes upstream reads.
+    before = len(produced)
+    for _ in range(10):
+        await stream.__anext__()
+    await asyncio.sleep(0.01)
+    assert len(produced) > before
+    await stream.aclose()
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_buffer_stream_aborts_slow_client() -> None:
+    from services.stream_buffer import SlowClientAborted, buffer_stats, buffer_stream
+
+    produced: list[int] = []
+    closed = asyncio.Event()
+    config = _config(
+        0, 100, high_watermark_bytes=500, low_watermark_bytes=100, slow_client_timeout_seconds=0.02
+    )
+    before = buffer_stats()
+    stream = buffer_stream(_endless(produced, closed), config=config)
+
+    await stream.__anext__()
+    await asyncio.sleep(0.1)
+    assert buffer_stats()["buffered_bytes"] == before["buffered_bytes"]
+    with pytest.raises(SlowClientAborted):
+        await stream.__anext__()
+
+    assert closed.is_set()
+    assert buffer_stats()["aborted"] == before["aborted"] + 1
+
+
+@pytest.mark.asyncio
+async def test_buffer_stream_sheds_slow_client_after_draining_buffer() -> None:
+    from services.stream_buffer import SlowClientAborted, buffer_stats, buffer_stream
+
+    produced: list[int] = []
+    closed = asyncio.Event()
+    config = _config(
+        0,
+        100,
+        high_watermark_bytes=500,
+        low_watermark_bytes=100,
+        slow_client_timeout_seconds=0.02,
+        slow_client_policy="shed",
+    )
+    stream = buffer_stream(_endless(produced, closed), config=config)
+
+    first = await stream.__anext__()
+    await asyncio.sleep(0.1)
+    assert closed.is_set()
+    rest: list[bytes] = []
+    with pytest.raises(SlowClientAborted):
+        async for w in stream:
+            rest.append(w)
+
+    assert len(first) + sum(len(w) for w in rest) == sum(produced)
+    assert buffer_stats()["buffered_bytes"] == 0
+
+
+def test_load_stream_buffer_config_validates_watermarks() -> None:
+    from services.stream_buffer import load_stream_buffer_config
+
+    cfg = load_stream_buffer_config({"stream_coalesce_window_ms": 5, "backpressure": {"slow_client_policy": "shed"}})
+    assert cfg.coalesce_window_seconds == pytest.approx(0.005)
+    assert cfg.slow_client_policy == "shed"
+
+    with pytest.raises(ValueError):
+        load_stream_buffer_config({"backpressure": {"high_watermark_bytes": 1000, "low_watermark_bytes": 1000}})
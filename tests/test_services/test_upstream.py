@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+
+def test_load_targets_accepts_strings_tables_and_unix_paths() -> None:
+    from services.upstream import UpstreamTarget, load_targets
+
+    targets = load_targets(
+        {"targets": ["http://10.0.0.1:8001", {"base_url": "unix:/run/llm.sock"}]},
+        default_base_url="http://localhost:8001",
+    )
+    assert targets == (
+        UpstreamTarget(base_url="http://10.0.0.1:8001"),
+        UpstreamTarget(base_url="unix:/run/llm.sock"),
+    )
+    assert targets[1].uds == "/run/llm.sock"
+    assert targets[1].url_for("/chat/completions") == "http://localhost/chat/completions"
+    assert load_targets({}, default_base_url="http://a:1") == (UpstreamTarget(base_url="http://a:1"),)
+
+
+def test_load_targets_rejects_bad_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    from services import upstream
+
+    with pytest.raises(ValueError, match="must start with"):
+        upstream.load_targets({"targets": ["localhost:8001"]}, default_base_url="http://a:1")
+    with pytest.raises(ValueError, match="socket path"):
+        upstream.load_targets({"targets": ["unix:"]}, default_base_url="http://a:1")
+
+    monkeypatch.setattr(upstream.importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(ValueError, match="httpx\\[http2\\]"):
+        upstream.load_targets({"targets": ["unix:/run/llm.sock"], "http2": True}, default_base_url="http://a:1")
+
+
+@pytest.mark.asyncio
+async def test_unix_socket_target_streams(tmp_path) -> None:
+    import httpx
+
+    from services.upstream import UpstreamTarget
+
+    path = str(tmp_path / "upstream.sock")
+    seen: list[bytes] = []
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        seen.append(await reader.readuntil(b"\r\n\r\n"))
+        writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 13\r\n\r\ndata: hello\n\n")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_unix_server(handle, path=path)
+    try:
+        target = UpstreamTarget(base_url=f"unix:{path}")
+        async with target.build_client(timeout=5, limits=httpx.Limits()) as client:
+            resp = await client.get(target.url_for("/chat/completions"))
+        assert resp.content == b"data: hello\n\n"
+        assert seen[0].startswith(b"GET /chat/completions HTTP/1.1")
+    finally:
+        server.close()
+        await server.wait_closed()
@@ -0,0 +1,112 @@
+import pytest
+
+
+def _chat_payload(messages: list[dict]) -> dict:
+    return {"model": "small", "messages": messages, "stream": True}
+
+
+def _history(turns: int, *, tool_output: str = "ok") -> list[dict]:
+    messages: list[dict] = [
+        {"role": "system", "content": "You are helpful."},
+        {"role": "user", "content": "fix the bug"},
+    ]
+    for i in range(turns):
+        messages.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {"id": f"call_{i}", "type": "function", "function": {"name": "shell", "arguments": "{}"}}
+                ],
+            }
+        )
+        messages.append({"role": "tool", "tool_call_id": f"call_{i}", "content": tool_output})
+    return messages
+
+
+def test_estimate_text_tokens_counts_wide_characters_densely() -> None:
+    from utils.context_budget import estimate_text_tokens
+
+    assert estimate_text_tokens("") == 0
+    assert estimate_text_tokens("abcdefgh") == 2
+    assert estimate_text_tokens("你好世界") >= 4
+
+
+def test_token_estimator_counts_each_message() -> None:
+    from utils.context_budget import TokenEstimator
+
+    estimator = TokenEstimator()
+    messages = [{"role": "user", "content": "abcdefgh"}, {"role": "tool", "tool_call_id": "c", "content": "x" * 400}]
+
+    assert estimator.count_messages(messages) == (4 + 2) + (4 + 100)
+    assert estimator.messages == len(messages)
+
+
+def test_fit_chat_payload_is_noop_without_limit() -> None:
+    from utils.context_budget import ContextBudgetConfig, TokenEstimator, fit_chat_payload_to_budget
+
+    payload = _chat_payload(_history(50, tool_output="x" * 10_000))
+    before = list(payload["messages"])
+    fit_chat_payload_to_budget(payload, config=ContextBudgetConfig(), estimator=TokenEstimator())
+    assert payload["messages"] == before
+
+
+def test_fit_chat_payload_truncates_old_tool_outputs() -> None:
+    from utils.context_budget import ContextBudgetConfig, TokenEstimator, fit_chat_payload_to_budget
+
+    config = ContextBudgetConfig(
+        model_limits={"small": 3000},
+        reserve_output_tokens=0,
+        policies=("truncate_tool_outputs",),
+        keep_recent_messages=2,
+        tool_output_max_chars=100,
+    )
+    payload = _chat_payload(_history(4, tool_output="x" * 4000))
+    fit_chat_payload_to_budget(payload, config=config, estimator=TokenEstimator())
+
+    messages = payload["messages"]
+    assert len(messages) == 10
+    assert messages[3]["content"].startswith("x" * 100 + "\n...[3900 chars truncated]")
+    # The most recent turn is left intact.
+    assert messages[-1]["content"] == "x" * 4000
+
+
+def test_fit_chat_payload_elides_middle_turns_keeping_tool_pairs() -> None:
+    from utils.context_budget import ContextBudgetConfig, TokenEstimator, fit_chat_payload_to_budget
+
+    config = ContextBudgetConfig(
+        model_limits={"small": 300},
+        reserve_output_tokens=0,
+        policies=("elide_middle",),
+        keep_recent_messages=4,
+    )
+    payload = _chat_payload(_history(20))
+    fit_chat_payload_to_budget(payload, config=config, estimator=TokenEstimator())
+
+    messages = payload["messages"]
+    assert messages[0]["role"] == "system"
+    assert messages[1] == {"role": "user", "content": "fix the bug"}
+    assert messages[-1]["tool_call_id"] == "call_19"
+    for i, msg in enumerate(messages):
+        if msg["role"] == "tool":
+            assert messages[i - 1]["tool_calls"][0]["id"] == msg["tool_call_id"]
+
+
+def test_fit_chat_payload_raises_when_budget_cannot_be_met() -> None:
+    from utils.context_budget import ContextBudgetConfig, TokenEstimator, fit_chat_payload_to_budget
+
+    config = ContextBudgetConfig(model_limits={"small": 10}, reserve_output_tokens=0)
+    payload = _chat_payload([{"role": "system", "content": "x" * 1000}, {"role": "user", "content": "hi"}])
+    with pytest.raises(ValueError):
+        fit_chat_payload_to_budget(payload, config=config, estimator=TokenEstimator())
+
+
+def test_load_context_budget_config_rejects_unknown_policy() -> None:
+    from utils.context_budget import load_context_budget_config
+
+    config = load_context_budget_config({"default_limit": 8192, "models": {"big": 131072}})
+    assert config.budget_for("big") == 131072 - 4096
+    assert config.budget_for("other") == 8192 - 4096
+
+    with pytest.raises(ValueError):
+        load_context_budget_config({"policies": ["summarize"]})
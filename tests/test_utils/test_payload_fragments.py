@@ -0,0 +1,55 @@
+import json
+
+
+def _chat_payload() -> dict:
+    return {
+        "model": "gpt-test",
+        "messages": [
+            {"role": "system", "content": "You are helpful. 你好 \"quoted\""},
+            {"role": "user", "content": "hi"},
+        ],
+        "stream": True,
+        "tools": [{"type": "function", "function": {"name": "shell", "parameters": {"type": "object"}}}],
+        "parallel_tool_calls": False,
+    }
+
+
+def test_encode_chat_payload_matches_plain_json() -> None:
+    from utils.payload_fragments import FragmentCache, encode_chat_payload, encode_json
+
+    payload = _chat_payload()
+    expected = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    body = encode_chat_payload(payload, fragments=FragmentCache())
+    assert json.loads(body) == payload
+    assert body == expected
+
+    tools_json = encode_json(payload["tools"])
+    assert encode_chat_payload(payload, fragments=FragmentCache(), tools_json=tools_json) == expected
+
+
+def test_encode_chat_payload_reuses_fragments_across_requests() -> None:
+    from utils.payload_fragments import FragmentCache, encode_chat_payload
+
+    cache = FragmentCache()
+    encode_chat_payload(_chat_payload(), fragments=cache)
+    assert cache.stats()["misses"] == 1
+
+    second = _chat_payload()
+    second["messages"].append({"role": "assistant", "content": "hello"})
+    body = encode_chat_payload(second, fragments=cache)
+    assert json.loads(body) == second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_fragment_cache_is_bounded() -> None:
+    from utils.payload_fragments import FragmentCache
+
+    cache = FragmentCache(max_entries=2, max_bytes=1024)
+    for i in range(5):
+        cache.instructions_fragment(f"prompt {i}")
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 3
+
+    cache.instructions_fragment("x" * 2048)
+    assert cache.stats()["bytes"] <= 1024
@@ -139,3 +139,24 @@ def test_format_response_request_rejects_missing_required_fields() -> None:
 
     with pytest.raises(ValueError):
         format_response_request(response_payload={})
+
+
+def test_input_history_reuses_unchanged_prefix() -> None:
+    from utils.request_formatter import InputHistory, format_response_request
+
+    def user(text: str) -> dict:
+        return {"type": "message", "role": "user", "content": [{"type": "input_text", "text": text}]}
+
+    history = InputHistory()
+    first = {"model": "m", "instructions": "i", "input": [user("a"), user("b")]}
+    second = {"model": "m", "instructions": "i", "input": [user("a"), user("b"), user("c")]}
+    edited = {"model": "m", "instructions": "i", "input": [user("a"), user("x")]}
+
+    format_response_request(response_payload=first, history=history)
+    cached = format_response_request(response_payload=second, history=history)
+    assert cached == format_response_request(response_payload=second)
+    assert (history.reused, history.translated) == (2, 3)
+
+    rewritten = format_response_request(response_payload=edited, history=history)
+    assert rewritten == format_response_request(response_payload=edited)
+    assert (history.reused, history.translated) == (3, 4)